@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from components.backends import BACKENDS  # noqa: E402
+from components.chart import Chart  # noqa: E402
+
+# Every chart whose group-by goes through the backend, plus the KPIs.
+METHODS = [
+    'compute_kpis', 'create_revenue_by_category', 'create_revenue_by_season', 'create_customer_by_age_group',
+    'create_gender_distribution', 'create_customer_count_age_group', 'create_review_rating_distribution',
+    'create_category_treemap', 'create_category_by_season', 'create_size_distribution',
+    'create_purchase_frequency', 'create_payment_methods', 'create_subscription_comparison',
+    'create_purchase_frequency_days', 'create_shipping_distribution', 'create_shipping_by_category',
+    'create_subscription_shipping', 'create_age_group_metrics',
+]
+FILTERS = [
+    (None, None, None, None, None),
+    (['Yes'], None, None, None, None),
+    (None, ['Female'], ['Clothing', 'Footwear'], None, ['Adult']),
+    (['No'], ['Male'], ['Outerwear'], ['Express', 'Free Shipping'], ['Senior']),
+    # Matches no rows.
+    (['Yes'], ['Female'], None, None, None),
+]
+
+
+def plain(value):
+    # Figures and KPI tuples as JSON-comparable values, with arrays decoded
+    # so that an int32 and an int64 column holding the same counts agree.
+    if hasattr(value, 'to_plotly_json'):
+        return plain(value.to_plotly_json())
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [plain(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def same(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return (a != a and b != b) or bool(np.isclose(a, b, rtol=1e-9, atol=1e-12))
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that every backend draws the same charts and time them against each other.')
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'data', 'customer_behavior.csv'))
+    parser.add_argument('--repeat', type=int, default=64,
+                        help='stack the dataset this many times')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    df = pd.concat([pd.read_csv(args.csv)] * args.repeat, ignore_index=True)
+    print(f'{len(df):,} rows, {os.cpu_count()} cores', file=sys.stderr)
+
+    report = {}
+    reference = None
+    for backend in args.backends:
+        try:
+            chart = Chart(df, backend=backend)
+        except ImportError as error:
+            print(f'{backend}: skipped ({error})', file=sys.stderr)
+            continue
+
+        results = {}
+        seconds = {}
+        for method in METHODS:
+            # Straight to the undecorated method, so the figure cache does
+            # not hide the backend's cost.
+            compute = getattr(Chart, method).__wrapped__
+            start = time.perf_counter()
+            results[method] = [plain(compute(chart, *filters)) for filters in FILTERS]
+            seconds[method] = time.perf_counter() - start
+
+        reference = reference or results
+        mismatches = [method for method in METHODS if not same(results[method], reference[method])]
+        report[backend] = {'seconds': seconds, 'total_seconds': sum(seconds.values()), 'mismatches': mismatches}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for backend, result in report.items():
+        print(f'{backend:>8}: {result["total_seconds"]:7.3f} s, '
+              f'{"same results" if not result["mismatches"] else "differs in " + ", ".join(result["mismatches"])}')
+    if any(result['mismatches'] for result in report.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
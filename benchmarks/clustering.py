@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from components.clustering import ClusterFeatures, MiniBatchKMeans, customer_features  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time the mini-batch k-means fit and labelling pass per worker count.')
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'data', 'customer_behavior.csv'))
+    parser.add_argument('--repeat', type=int, default=256,
+                        help='stack the dataset this many times')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    # Every copy gets its own customers, since customers are what is clustered.
+    df = pd.read_csv(args.csv)
+    df = pd.concat([df.assign(customer_id=df['customer_id'] + copy * int(df['customer_id'].max()))
+                    for copy in range(args.repeat)], ignore_index=True)
+    codes, customers = pd.factorize(df['customer_id'])
+    features = ClusterFeatures(customer_features(df, codes, len(customers)))
+    print(f'{features.n_rows:,} customers x {features.width} features, {os.cpu_count()} cores')
+
+    baseline = None
+    reference = None
+    for workers in args.workers:
+        model = MiniBatchKMeans(max_workers=workers)
+        start = time.perf_counter()
+        model.fit(features)
+        fitted = time.perf_counter()
+        labels = model.predict(features)
+        done = time.perf_counter()
+
+        baseline = baseline or done - start
+        reference = labels if reference is None else reference
+        print(f'{workers:3d} workers: fit {fitted - start:6.2f} s ({model.steps} steps), '
+              f'label {done - fitted:6.2f} s, speedup {baseline / (done - start):4.2f}x, '
+              f'same labels: {np.array_equal(labels, reference)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['plotly.express', 'plotly.subplots']
+
+
+def measure(module):
+    # Each run is a fresh interpreter so nothing is already in sys.modules.
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f'import sys, {module}; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+
+    loaded = [m for m in result.stdout.strip().split(',') if m]
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report the cold import cost of the components package.')
+    parser.add_argument('--module', default='components')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float,
+                        help='fail when the median cold import exceeds this')
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        timings, loaded = measure(args.module)
+        totals.append(timings[args.module][1] / 1000)
+
+    median = statistics.median(totals)
+    print(f'{args.module}: median {median:.1f} ms, '
+          f'min {min(totals):.1f} ms, max {max(totals):.1f} ms over {args.runs} runs')
+
+    print('\nHeaviest imports (self time, last run):')
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms cumulative  {name}')
+
+    if loaded:
+        print(f'\nHeavy modules loaded eagerly: {", ".join(loaded)}')
+
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f'\nOver budget: {median:.1f} ms > {args.budget_ms:.1f} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACTIONS = ['select', 'deselect', 'clear', 'measure', 'tab']
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak rather than current RSS, but the best portable fallback.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def step(at, rng):
+    action = rng.choice(ACTIONS)
+    if action == 'measure':
+        radio = at.sidebar.radio[0]
+        return action, radio.set_value(rng.choice(radio.options))
+
+    if action == 'tab':
+        # Tabs switch in the browser without a rerun; this charges the
+        # switch as a plain rerun, which is what a tab switch costs once
+        # tabs render on change.
+        return action, at
+
+    widget = rng.choice(at.sidebar.multiselect)
+    if action == 'clear':
+        return action, widget.set_value([])
+    if action == 'deselect' and widget.value:
+        return action, widget.unselect(rng.choice(widget.value))
+
+    # Only values still offered can be picked; clearing the widget widens
+    # the choice again when a narrow selection left nothing.
+    choices = [option for option in widget.options if option not in widget.value]
+    if not choices:
+        return 'clear', widget.set_value([])
+    return 'select', widget.select(rng.choice(choices))
+
+
+def session(index, args, results, errors, start_barrier):
+    rng = random.Random(args.seed + index)
+    at = AppTest.from_file(args.app, default_timeout=args.timeout)
+
+    start = time.perf_counter()
+    try:
+        at.run()
+        results['cold'].append(time.perf_counter() - start)
+    except Exception as error:
+        errors.append(repr(error))
+        return
+    finally:
+        start_barrier.wait()
+
+    for _ in range(args.steps):
+        action, widget = step(at, rng)
+        time.sleep(rng.uniform(0, args.think_ms / 1000))
+
+        start = time.perf_counter()
+        widget.run()
+        results['reruns'].append((action, time.perf_counter() - start))
+        errors.extend(exception.value for exception in at.exception)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Drive simulated dashboard sessions in one process and report rerun latency.')
+    parser.add_argument('--app', default=os.path.join(ROOT, 'main.py'))
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--steps', type=int, default=20,
+                        help='interactions per session after the first run')
+    parser.add_argument('--think-ms', type=float, default=0,
+                        help='random pause of up to this long before each interaction')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    # The harness never needs the background file watcher.
+    os.environ.setdefault('CUSTOMER_DATA_WATCH_SECONDS', '0')
+    os.chdir(os.path.dirname(os.path.abspath(args.app)))
+
+    results = {'cold': [], 'reruns': []}
+    errors = []
+    rss_start = rss_bytes()
+    rss_peak = [rss_start]
+    stopped = threading.Event()
+
+    def sample_rss():
+        while not stopped.wait(0.1):
+            rss_peak[0] = max(rss_peak[0], rss_bytes())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+
+    # Sessions load concurrently, then start interacting together so the
+    # measured window only contains warm reruns.
+    start_barrier = threading.Barrier(args.sessions + 1)
+    threads = [threading.Thread(target=session, args=(index, args, results, errors, start_barrier))
+               for index in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stopped.set()
+
+    latencies = [seconds for _, seconds in results['reruns']]
+    by_action = {}
+    for action, seconds in results['reruns']:
+        by_action.setdefault(action, []).append(seconds)
+
+    report = {
+        'sessions': args.sessions,
+        'reruns': len(latencies),
+        'errors': len(errors),
+        'cold_run_median_s': statistics.median(results['cold']) if results['cold'] else float('nan'),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'throughput_per_s': len(latencies) / elapsed if elapsed else float('nan'),
+        'rss_start_mb': rss_start / 2**20,
+        'rss_peak_mb': max(rss_peak[0], rss_bytes()) / 2**20,
+        'rss_end_mb': rss_bytes() / 2**20,
+        'actions': {action: {'count': len(values), 'p50_ms': percentile(values, 50) * 1000}
+                    for action, values in sorted(by_action.items())},
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['sessions']} sessions, {report['reruns']} reruns in {elapsed:.1f} s, "
+              f"{report['errors']} errors")
+        print(f"cold first run: median {report['cold_run_median_s']:.2f} s")
+        print(f"rerun latency: p50 {report['p50_ms']:.0f} ms, p95 {report['p95_ms']:.0f} ms, "
+              f"p99 {report['p99_ms']:.0f} ms")
+        print(f"throughput: {report['throughput_per_s']:.2f} reruns/s")
+        print(f"RSS: start {report['rss_start_mb']:.0f} MB, peak {report['rss_peak_mb']:.0f} MB, "
+              f"end {report['rss_end_mb']:.0f} MB")
+        for action, summary in report['actions'].items():
+            print(f"  {action:9s} {summary['count']:4d} reruns, p50 {summary['p50_ms']:.0f} ms")
+    for error in sorted(set(errors))[:5]:
+        print(f'error: {error}', file=sys.stderr)
+
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import inspect
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.backends import FILTERS, METHODS, plain, same  # noqa: E402
+from components.backends import BACKENDS, DEFAULT_BACKEND, make_backend  # noqa: E402
+from components.chart import Chart  # noqa: E402
+from components.cube import FILTER_DIMENSIONS  # noqa: E402
+
+# The backend operations the charts ask for, each checked on its own
+# against the same operation written directly in pandas.
+VALUE_COUNTS = ['age_group', 'gender', 'review_rating', 'size', 'frequency_of_purchases', 'payment_method',
+                'purchase_frequency_days', 'shipping_type']
+GROUP_SIZES = [['category', 'item_purchased'], ['season', 'category'], ['subscription_status', 'category'],
+               ['shipping_type', 'category'], ['subscription_status', 'shipping_type']]
+GROUP_AGGREGATES = [('category', 'purchase_amount', 'sum'), ('season', 'purchase_amount', 'sum')]
+AGGREGATIONS = {
+    'total_revenue': ('purchase_amount', 'sum'),
+    'average_order_value': ('purchase_amount', 'mean'),
+    'total_customers': ('customer_id', 'nunique'),
+    'average_rating': ('review_rating', 'mean'),
+}
+RANGES = {'age': (30, 50), 'purchase_amount': (40, 80)}
+
+
+def routed_methods():
+    return sorted(name for name, method in inspect.getmembers(Chart, inspect.isfunction)
+                  if 'self.backend.' in inspect.getsource(method) and name != 'memory_usage')
+
+
+def expected_rows(df, filters, ranges=None):
+    mask = np.ones(len(df), dtype=bool)
+    for dimension, selected in zip(FILTER_DIMENSIONS, filters):
+        if selected is not None:
+            mask &= df[dimension].isin(selected).to_numpy()
+    for column, (low, high) in (ranges or {}).items():
+        mask &= df[column].between(low, high).to_numpy()
+    return df[mask]
+
+
+def check_operations(name, backend, rows, frame, label):
+    for column in VALUE_COUNTS:
+        result = backend.value_counts(rows, column)
+        assert same(plain(result.to_dict()), plain(frame[column].value_counts().to_dict())), \
+            f'{name}: value_counts({column!r}) differs on {label}'
+        assert result.is_monotonic_decreasing, f'{name}: value_counts({column!r}) is not sorted on {label}'
+    for keys in GROUP_SIZES:
+        result = backend.group_size(rows, keys)
+        expected = frame.groupby(keys).size().reset_index(name='count')
+        assert list(result.columns) == list(expected.columns), f'{name}: group_size({keys}) columns on {label}'
+        assert same(plain(result.sort_values(keys).to_dict('list')), plain(expected.to_dict('list'))), \
+            f'{name}: group_size({keys}) differs on {label}'
+    for by, column, how in GROUP_AGGREGATES:
+        result = backend.group_aggregate(rows, by, column, how)
+        assert same(plain(result.to_dict()), plain(frame.groupby(by)[column].agg(how).to_dict())), \
+            f'{name}: group_aggregate({by!r}, {column!r}, {how!r}) differs on {label}'
+    expected = {key: getattr(frame[column], how)() for key, (column, how) in AGGREGATIONS.items()}
+    assert same(plain(backend.aggregate(rows, AGGREGATIONS)), plain(expected)), \
+        f'{name}: aggregate differs on {label}'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check every backend against pandas, operation by operation and chart by chart.')
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'data', 'customer_behavior.csv'))
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    args = parser.parse_args()
+
+    missing = set(routed_methods()) - set(METHODS)
+    assert not missing, f'charts routed through the backend but not checked: {sorted(missing)}'
+
+    df = pd.read_csv(args.csv)
+    assert any(expected_rows(df, filters).empty for filters in FILTERS), 'no empty selection among the filters'
+    reference = Chart(df, backend=DEFAULT_BACKEND)
+    views = {'all rows': reference, 'ranges': reference.with_filters(ranges=RANGES)}
+    expected = {label: [plain(getattr(view, method)(*filters)) for method in METHODS for filters in FILTERS]
+                for label, view in views.items()}
+
+    checked = []
+    for name in args.backends:
+        try:
+            backend = make_backend(name, reference.df)
+            chart = Chart(df, backend=name)
+        except ImportError as error:
+            print(f'{name}: skipped ({error})', file=sys.stderr)
+            continue
+
+        # None stands for every row, which backends may handle on a
+        # separate path.
+        check_operations(name, backend, None, df, 'all rows')
+        for label, view in views.items():
+            for filters in FILTERS:
+                rows = view.filter_rows(view.selections(*filters))
+                frame = expected_rows(df, filters, RANGES if label == 'ranges' else None)
+                assert np.array_equal(np.sort(rows), frame.index.to_numpy()), f'{label} {filters}: rows differ'
+                check_operations(name, backend, rows, frame, f'{label} {filters}')
+
+        for label, view in {'all rows': chart, 'ranges': chart.with_filters(ranges=RANGES)}.items():
+            results = [plain(getattr(view, method)(*filters)) for method in METHODS for filters in FILTERS]
+            for index, (result, wanted) in enumerate(zip(results, expected[label])):
+                method, filters = METHODS[index // len(FILTERS)], FILTERS[index % len(FILTERS)]
+                assert same(result, wanted), f'{name}: {method}{filters} on {label} differs from pandas'
+        checked.append(name)
+
+    print(f'backends: ok ({", ".join(checked)}; {len(METHODS)} methods, {len(FILTERS)} filters)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from components.cube import FILTER_DIMENSIONS, Cube  # noqa: E402
+
+
+def selections_to_check(cube, samples, seed):
+    # No filters, each level on its own, every single cell (which covers
+    # empty and one-row selections), a level that does not exist, and
+    # random multi-level filters.
+    checks = [{}]
+    for dimension in FILTER_DIMENSIONS:
+        checks += [{dimension: [level]} for level in cube.levels[dimension]]
+    for cell in np.ndindex(cube.shape):
+        checks.append({dimension: [cube.levels[dimension][code]]
+                       for dimension, code in zip(FILTER_DIMENSIONS, cell)})
+    checks.append({'category': ['No such category']})
+
+    rng = np.random.default_rng(seed)
+    for _ in range(samples):
+        selections = {}
+        for dimension in FILTER_DIMENSIONS:
+            levels = cube.levels[dimension]
+            if rng.random() < 0.6:
+                picked = rng.choice(len(levels), size=rng.integers(1, len(levels) + 1), replace=False)
+                selections[dimension] = [levels[code] for code in sorted(picked)]
+        checks.append(selections)
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that Cube.correlation matches DataFrame.corr() on the filtered rows.')
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'data', 'customer_behavior.csv'))
+    parser.add_argument('--samples', type=int, default=500, help='random filter combinations to check')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--atol', type=float, default=1e-8)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    cube = Cube(df)
+
+    checked = 0
+    sizes = set()
+    for selections in selections_to_check(cube, args.samples, args.seed):
+        mask = np.ones(len(df), dtype=bool)
+        for dimension, levels in selections.items():
+            mask &= df[dimension].isin(levels).to_numpy()
+
+        expected = df.loc[mask, cube.measures].corr()
+        actual = cube.correlation(selections)
+
+        assert list(actual.index) == list(expected.index) and list(actual.columns) == list(expected.columns)
+        # Undefined correlations (fewer than two rows, or a constant
+        # column) must be NaN in both.
+        assert np.array_equal(np.isnan(actual.values), np.isnan(expected.values)), \
+            f'{selections}: NaN pattern differs\n{actual}\n{expected}'
+        assert np.allclose(actual.values, expected.values, rtol=0, atol=args.atol, equal_nan=True), \
+            f'{selections}: max difference {np.nanmax(np.abs(actual.values - expected.values))}'
+        checked += 1
+        sizes.add(min(int(mask.sum()), 2))
+
+    assert sizes == {0, 1, 2}, f'empty, one-row and larger selections not all covered: {sizes}'
+    print(f'correlation: ok ({checked} selections)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import io
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime  # noqa: E402
+
+from components.chart import Chart  # noqa: E402
+from components.export import FORMATS, export_file  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that exports are accepted by st.download_button and hold the filtered rows.')
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'data', 'customer_behavior.csv'))
+    args = parser.parse_args()
+
+    chart = Chart(args.csv)
+    for selections in ({}, chart.selections(['Yes'], None, ['Clothing'], None, None),
+                       chart.selections(['Yes'], ['Female'], None, None, None)):
+        expected = len(chart.filter_rows(selections))
+        for fmt in FORMATS:
+            with export_file(chart, selections, fmt, chunk_rows=1000) as out:
+                # The same conversion st.download_button applies to the
+                # value returned by its data callable.
+                data, _ = convert_data_to_bytes_and_infer_mime(
+                    out, unsupported_error=TypeError(f'{fmt}: unsupported {type(out)}'))
+            read = pd.read_csv if fmt == 'csv' else pd.read_parquet
+            rows = len(read(io.BytesIO(data))) if data.strip() else 0
+            assert rows == expected, f'{fmt}: {rows} rows exported, {expected} selected'
+    print('export: ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,8 @@
 from .chart import Chart
+from .dataset import PartitionedDataset
+from .filters import FilterState
+from .registry import DatasetRegistry
+from .watcher import DatasetWatcher
 
-__all__ = ['Chart']
+__all__ = ['Chart', 'DatasetRegistry', 'DatasetWatcher',
+           'FilterState', 'PartitionedDataset']
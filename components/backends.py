@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# Both backends take the row ids picked by the filter index (None for all
+# rows) and return pandas objects shaped like the pandas results, so every
+# chart draws the same figure whichever one computed it.
+DEFAULT_BACKEND = 'pandas'
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, df):
+        self.df = df
+
+    def memory_usage(self):
+        # Shares the chart's frame.
+        return 0
+
+    def gather(self, rows, columns):
+        df = self.df[columns]
+        return df if rows is None else df.iloc[rows]
+
+    def value_counts(self, rows, column):
+        return self.gather(rows, [column])[column].value_counts()
+
+    def group_size(self, rows, keys):
+        return self.gather(rows, keys).groupby(keys).size().reset_index(name='count')
+
+    def group_aggregate(self, rows, by, column, how):
+        return self.gather(rows, [by, column]).groupby(by)[column].agg(how)
+
+    def aggregate(self, rows, aggregations):
+        df = self.gather(rows, list(dict.fromkeys(column for column, _ in aggregations.values())))
+        totals = {name: getattr(df[column], how)() for name, (column, how) in aggregations.items()}
+        return {name: value.item() if isinstance(value, np.generic) else value for name, value in totals.items()}
+
+
+class PolarsBackend:
+    # The same operations as lazy Polars plans: only the needed columns are
+    # read, the rows are gathered inside the plan, and the group-bys run on
+    # all cores.
+    name = 'polars'
+
+    def __init__(self, df):
+        import polars as pl
+
+        self.df = df
+        self.frame = pl.from_pandas(df).with_columns(pl.col(pl.Categorical).cast(pl.String))
+
+    def __getstate__(self):
+        return {'df': self.df}
+
+    def __setstate__(self, state):
+        self.__init__(state['df'])
+
+    def memory_usage(self):
+        return self.frame.estimated_size()
+
+    def scan(self, rows, columns):
+        import polars as pl
+
+        plan = self.frame.lazy().select(columns)
+        return plan if rows is None else plan.select(pl.all().gather(rows))
+
+    def value_counts(self, rows, column):
+        import polars as pl
+
+        # Ties keep the order of first appearance, as in pandas.
+        counts = (self.scan(rows, [column]).drop_nulls()
+                  .group_by(column, maintain_order=True).agg(pl.len().cast(pl.Int64).alias('count'))
+                  .sort('count', descending=True, maintain_order=True).collect())
+        return pd.Series(counts['count'].to_numpy(), name='count',
+                         index=pd.Index(counts[column].to_list(), name=column))
+
+    def group_size(self, rows, keys):
+        import polars as pl
+
+        return (self.scan(rows, keys).drop_nulls()
+                .group_by(keys).agg(pl.len().cast(pl.Int64).alias('count'))
+                .sort(keys).collect().to_pandas())
+
+    def group_aggregate(self, rows, by, column, how):
+        import polars as pl
+
+        result = (self.scan(rows, [by, column]).drop_nulls(by)
+                  .group_by(by).agg(getattr(pl.col(column), how)())
+                  .sort(by).collect())
+        return pd.Series(result[column].to_numpy(), name=column,
+                         index=pd.Index(result[by].to_list(), name=by))
+
+    def aggregate(self, rows, aggregations):
+        import polars as pl
+
+        columns = list(dict.fromkeys(column for column, _ in aggregations.values()))
+        totals = self.scan(rows, columns).select([
+            (pl.col(column).drop_nulls().n_unique() if how == 'nunique' else getattr(pl.col(column), how)())
+            .alias(name) for name, (column, how) in aggregations.items()
+        ]).collect().row(0, named=True)
+        # An empty selection has a null mean in Polars and NaN in pandas.
+        return {name: np.nan if value is None else value for name, value in totals.items()}
+
+
+BACKENDS = {
+    'pandas': PandasBackend,
+    'polars': PolarsBackend,
+}
+
+
+def make_backend(name, df):
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown backend: {name}')
+    return BACKENDS[name](df)
@@ -0,0 +1,154 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+
+class SingleFlight:
+    # Concurrent calls for the same key share one computation: the first
+    # caller runs it and the others wait for its result (or its exception).
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def do(self, key, compute):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(compute())
+        except BaseException as error:
+            future.set_exception(error)
+        finally:
+            # Later calls start a fresh computation; only callers that
+            # arrived while this one was running share its result.
+            with self.lock:
+                del self.calls[key]
+        return future.result()
+
+
+class LRUCache:
+    def __init__(self, capacity=32, max_bytes=None):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        # key -> (value, bytes held, seconds it took to compute)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.saved_seconds = 0.0
+
+    def __getstate__(self):
+        return {'capacity': self.capacity, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['capacity'], state.get('max_bytes'))
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                value, _, seconds = self.entries[key]
+                self.hits += 1
+                self.saved_seconds += seconds
+                return value
+            self.misses += 1
+
+        def timed():
+            start = time.perf_counter()
+            value = compute()
+            return self.store(key, value, time.perf_counter() - start)
+
+        return self.flight.do(key, timed)
+
+    def store(self, key, value, seconds=0.0):
+        size = nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries[key][1]
+            self.entries[key] = (value, size, seconds)
+            self.entries.move_to_end(key)
+            self.bytes += size
+            self.evict()
+        return value
+
+    def evict(self):
+        # The newest entry is kept even when it alone exceeds the byte budget.
+        while len(self.entries) > self.capacity or \
+                (self.max_bytes is not None and self.bytes > self.max_bytes and len(self.entries) > 1):
+            _, (_, size, _) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def resize(self, capacity=None, max_bytes=None):
+        with self.lock:
+            if capacity is not None:
+                self.capacity = capacity
+            if max_bytes is not None:
+                self.max_bytes = max_bytes or None
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'saved_seconds': self.saved_seconds,
+                'capacity': self.capacity,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def nbytes(value):
+    # Approximate memory held by a cached value: arrays and frames by their
+    # buffers, figures by their trace and layout specs, containers by their
+    # contents.
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(key) + nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(nbytes(item) for item in value)
+    if hasattr(value, '_data') and hasattr(value, '_layout'):
+        return nbytes(value._data) + nbytes(value._layout)
+    if callable(getattr(value, 'memory_usage', None)):
+        return value.memory_usage()
+    return sys.getsizeof(value)
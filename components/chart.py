@@ -1,1182 +1,1057 @@
+import copy
+import functools
+import os
+import uuid
+
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
-import streamlit as st
-from plotly.subplots import make_subplots
+
+from .backends import DEFAULT_BACKEND, make_backend
+from .cache import LRUCache
+from .clustering import CLUSTERS, cluster_customers
+from .compare import COMPARE_DIMENSIONS, compare_segments, segment_tags
+from .cube import Cube, FILTER_DIMENSIONS
+from .dataset import PartitionedDataset, freeze
+from .figures import (BAR_OUTLINE, HEATMAP_COLORSCALE, PX_AXIS, PX_YAXIS, axis, color_bars, figure, hline,
+                      layout, subplot_layout, title_color, treemap, trendline_scatter, vline)
+from .filters import selection_key
+from .ranges import SortedIndex
+from .sample import (SampleBackend, estimate_distinct, estimate_kpis, stratified_group_totals,
+                     stratified_sample)
+from .segments import RFM_COLUMNS, SEGMENTS, customer_rfm
+from .snapshot import source_hash
+from .stats import mean_intervals
+from .topk import top_k
 
 PRIMARY_COLOR = '#7b3785'
 SECONDARY_COLOR = '#a855b8'
 ACCENT_COLOR = '#d8b4e2'
 COLORS_PALETTE = ['#7b3785', '#a855b8', '#d8b4e2', '#6b2d73', '#8e4a94']
 GRADIENT_COLORS = ['#4a1f52', '#7b3785', '#a855b8', '#d8b4e2', '#f0e6f5']
+TOP_K_COLUMNS = ['item_purchased', 'color', 'location']
+# Default cache budgets; DatasetRegistry.configure_caches changes them at
+# runtime.
+AGGREGATE_CACHE_ENTRIES = 32
+FIGURE_CACHE_ENTRIES = 256
+FIGURE_CACHE_BYTES = 64 * 2**20
 
+# Bump whenever the derived structures built in Chart.__init__ change, so
+# that persisted snapshots from older code are not reused.
+CHART_VERSION = 7
 
-class Chart:
-    def __init__(self, csv_file):
-        self.df = pd.read_csv(csv_file)
 
-    def filter_data(self, subscription_status, gender, category, shipping_type, age_group):
-        df = self.df.copy()
+def dataset_version(csv_file, partitions=None):
+    if isinstance(csv_file, (str, os.PathLike, PartitionedDataset)):
+        return f'{source_hash(csv_file, partitions)[:32]}-v{CHART_VERSION}'
+    return uuid.uuid4().hex
 
-        if subscription_status is not None:
-            df = df[df['subscription_status'] == subscription_status]
 
-        if gender is not None:
-            df = df[df['gender'] == gender]
+def coalesced(method):
+    # Results are cached per dataset version, method, filters and options.
+    # Sessions asking for the same result at the same time (a shared
+    # dashboard link) wait for one computation of it.
+    @functools.wraps(method)
+    def wrapper(self, subscription_status, gender, category, shipping_type, age_group, **options):
+        key = (self.version, method.__name__, self.cache_key(self.selections(
+            subscription_status, gender, category, shipping_type, age_group)), tuple(sorted(options.items())))
+        return self.figure_cache.get_or_compute(key, lambda: method(
+            self, subscription_status, gender, category, shipping_type, age_group, **options))
 
-        if category is not None:
-            df = df[df['category'] == category]
+    return wrapper
 
-        if shipping_type is not None:
-            df = df[df['shipping_type'] == shipping_type]
 
-        if age_group is not None:
-            df = df[df['age_group'] == age_group]
-
-        return df
+class Chart:
+    def __init__(self, csv_file, partitions=None, version=None, backend=DEFAULT_BACKEND):
+        self.source = csv_file
+        self.partitions = partitions
+        self.version = version or dataset_version(csv_file, partitions)
+
+        if isinstance(csv_file, (str, os.PathLike)) and os.path.isdir(csv_file):
+            csv_file = PartitionedDataset(csv_file)
+
+        if isinstance(csv_file, PartitionedDataset):
+            self.dataset = csv_file
+            df = self.dataset.load(partitions)
+        elif isinstance(csv_file, pd.DataFrame):
+            self.dataset = None
+            df = csv_file
+        else:
+            self.dataset = None
+            df = pd.read_csv(csv_file)
+
+        self.df = freeze(df)
+
+        self.cube = Cube(self.df)
+        self.backend = make_backend(backend, self.df)
+        self.encodings = {column: pd.factorize(self.df[column], use_na_sentinel=False)
+                          for column in TOP_K_COLUMNS}
+        self.aggregate_cache = LRUCache(AGGREGATE_CACHE_ENTRIES)
+        self.figure_cache = LRUCache(FIGURE_CACHE_ENTRIES, FIGURE_CACHE_BYTES)
+        self.filter_state = None
+        self.row_filters = {}
+        self.ranges = {}
+
+    def __getstate__(self):
+        # Snapshots leave out the session's filter cache.
+        state = self.__dict__.copy()
+        state['filter_state'] = None
+        return state
+
+    def __copy__(self):
+        # Views (for_session, with_filters, sample) share everything,
+        # including the session's filter cache that pickling leaves out.
+        view = self.__class__.__new__(self.__class__)
+        view.__dict__.update(self.__dict__)
+        return view
+
+    def memory_usage(self):
+        nbytes = int(self.df.memory_usage(deep=True).sum())
+        nbytes += sum(array.nbytes for array in (
+            self.cube.cells, self.cube.counts, self.cube.sums, self.cube.cross, *self.cube.codes.values()))
+        nbytes += sum(codes.nbytes + labels.memory_usage(deep=True)
+                      for codes, labels in self.encodings.values())
+        return nbytes + self.backend.memory_usage()
+
+    def cache_bytes(self):
+        return self.aggregate_cache.bytes + self.figure_cache.bytes
+
+    def cache_stats(self):
+        return {'aggregate': self.aggregate_cache.stats(), 'figure': self.figure_cache.stats()}
+
+    def coalescing_stats(self):
+        flights = (self.figure_cache.flight, self.aggregate_cache.flight)
+        return {
+            'computations': sum(flight.executions for flight in flights),
+            'coalesced_requests': sum(flight.coalesced for flight in flights),
+        }
+
+    def for_session(self, filter_state):
+        session = copy.copy(self)
+        session.filter_state = filter_state
+        return session
+
+    def with_filters(self, segment=None, cluster=None, ranges=None):
+        view = copy.copy(self)
+        view.row_filters = {key: list(value) for key, value in dict(
+            segment=segment, cluster=cluster).items() if value}
+        # A range spanning the whole column filters nothing and is dropped,
+        # so it keeps the unfiltered fast paths and cache entries.
+        view.ranges = {}
+        for column, (low, high) in sorted((ranges or {}).items()):
+            lowest, highest = self.range_index(column).bounds()
+            if low > lowest or high < highest:
+                view.ranges[column] = (low, high)
+        return view
+
+    def filtered(self):
+        return bool(self.row_filters or self.ranges)
+
+    def filter_data(self, subscription_status, gender, category, shipping_type, age_group, columns=None):
+        rows = self.selected_rows(subscription_status, gender, category, shipping_type, age_group)
+
+        # The base frame is shared by every session and never written to.
+        # Callers always get a new frame: a projection, a gather or a
+        # shallow copy. Copy-on-write, on by default from pandas 3 (the
+        # pinned minimum), keeps any later edit local to it, and adding a
+        # column does not reach the base frame.
+        df = self.df.copy(deep=False) if columns is None else self.df[columns]
+        return df if rows is None else df.iloc[rows]
+
+    def selected_rows(self, subscription_status, gender, category, shipping_type, age_group):
+        # None when nothing is filtered, so backends can skip the gather.
+        selections = self.selections(
+            subscription_status, gender, category, shipping_type, age_group)
+        if all(selected is None for selected in selections.values()) and not self.filtered():
+            return None
+        return self.filter_rows(selections)
+
+    def filter_rows(self, selections):
+        rows = self.range_rows(selections) if self.ranges else self.category_rows(selections)
+
+        # Row filters are not cube dimensions, so they are checked against
+        # the already narrowed rows only.
+        for name, selected in self.row_filters.items():
+            levels, labels = self.row_labels(name)
+            rows = rows[np.isin(levels, selected)[labels[rows]]]
+        return rows
+
+    def category_rows(self, selections):
+        if self.filter_state is not None:
+            return self.filter_state.rows(self, selections)
+        # Each selection may be a single value or a list of values. The
+        # per-dimension selections are folded into one lookup table over
+        # cube cells, so any number of values costs a single gather.
+        return np.flatnonzero(self.cube.cell_mask(selections)[self.cube.cells])
+
+    def range_rows(self, selections):
+        # Only the narrowest of the range slices and the categorical
+        # selection is materialized; the other filters are checked on its
+        # rows alone, so no filter costs a pass over the whole column.
+        spans = {column: self.range_index(column).span(low, high) for column, (low, high) in self.ranges.items()}
+        narrowest = min(spans, key=lambda column: spans[column][1] - spans[column][0])
+        start, stop = spans[narrowest]
+        lookup = self.cube.cell_mask(selections)
+
+        if self.cube.counts[lookup].sum() < stop - start:
+            rows = self.category_rows(selections)
+            narrowest = None
+        else:
+            # Sorted back into row order, which the charts' group orders
+            # depend on.
+            rows = np.sort(self.range_index(narrowest).order[start:stop])
+            rows = rows[lookup[self.cube.cells[rows]]]
+
+        for column, (low, high) in self.ranges.items():
+            if column != narrowest:
+                values = self.df[column].to_numpy()[rows]
+                rows = rows[(values >= low) & (values <= high)]
+        return rows
+
+    def range_index(self, column):
+        return self.aggregate_cache.get_or_compute(
+            ('range_index', column), lambda: SortedIndex(self.df[column].to_numpy()))
+
+    def range_bounds(self, column):
+        return self.range_index(column).bounds()
+
+    def row_labels(self, name):
+        if name == 'segment':
+            return SEGMENTS, self.customer_segments()
+        return CLUSTERS, self.customer_clusters()
+
+    def cache_key(self, selections):
+        return (selection_key(selections, FILTER_DIMENSIONS),
+                tuple((key, frozenset(value)) for key, value in sorted(self.row_filters.items())),
+                tuple(sorted(self.ranges.items())))
+
+    def customer_rfm(self):
+        # Customers are scored once, on the full data. The RFM filter and
+        # the Segments tab both use these scores, so filtering to a segment
+        # shows only that segment.
+        return self.aggregate_cache.get_or_compute(('customer_rfm',), lambda: customer_rfm(self.df[RFM_COLUMNS]))
+
+    def customer_segments(self):
+        def compute():
+            rfm, codes = self.customer_rfm()
+            return rfm['segment'].cat.codes.to_numpy()[codes]
+
+        return self.aggregate_cache.get_or_compute(('customer_segments',), compute)
+
+    def customer_clusters(self):
+        # The cluster of each row's customer.
+        return self.aggregate_cache.get_or_compute(
+            ('customer_clusters', self.version), lambda: cluster_customers(self.df))
+
+    def cluster_customers(self, selections):
+        # Distinct customers per cluster with a purchase in the selection.
+        rows = self.filter_rows(selections)
+        _, first = np.unique(self.encoding('customer_id')[0][rows], return_index=True)
+        return np.bincount(self.customer_clusters()[rows[first]], minlength=len(CLUSTERS))
+
+    def cluster_profiles(self, selections):
+        # Customer counts per cluster, and the averages of the selected
+        # purchases of its customers.
+        def compute():
+            rows = self.filter_rows(selections)
+            labels = self.customer_clusters()[rows]
+            weights = self.row_weights(rows)
+            purchases = np.bincount(labels, weights=weights, minlength=len(CLUSTERS))
+            profiles = pd.DataFrame({'customers': self.cluster_customers(selections)}, index=CLUSTERS)
+            for column in self.cube.measures:
+                values = self.df[column].to_numpy(dtype=float)[rows]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    profiles[column] = np.bincount(
+                        labels, weights=values if weights is None else values * weights,
+                        minlength=len(CLUSTERS)) / purchases
+            return profiles
+
+        return self.aggregate_cache.get_or_compute(
+            ('cluster_profiles', self.version, self.cache_key(selections)), compute)
+
+    def row_weights(self, rows):
+        # How many rows of the full data each row stands for; None when the
+        # chart holds the full data.
+        return None
+
+    def segment_customers(self, selections):
+        return self.rfm(selections)['segment'].value_counts().reindex(SEGMENTS, fill_value=0)
+
+    def sample(self):
+        # The stratified sample is drawn once per dataset version; views of
+        # it carry this view's row filters.
+        sample = self.aggregate_cache.get_or_compute(
+            ('sample', self.version), lambda: SampleChart(self, stratified_sample(self.cube.cells)))
+        view = copy.copy(sample)
+        view.row_filters = self.row_filters
+        view.ranges = self.ranges
+        return view
+
+    def encoding(self, column):
+        if column in self.encodings:
+            return self.encodings[column]
+        return self.aggregate_cache.get_or_compute(
+            ('encoding', column), lambda: pd.factorize(self.df[column], use_na_sentinel=False))
+
+    def compare(self, selections_a, selections_b):
+        # Rows are tagged with the segment(s) they fall in, and all
+        # statistics for both segments come from one grouping of the tags.
+        def compute():
+            tags = segment_tags(len(self.df), self.filter_rows(selections_a), self.filter_rows(selections_b))
+            return compare_segments(
+                tags,
+                {column: self.df[column].to_numpy(dtype=float) for column in self.cube.measures},
+                self.df['purchase_amount'].to_numpy(dtype=float),
+                self.df['review_rating'].to_numpy(dtype=float),
+                self.encoding('customer_id')[0],
+                {dimension: self.encoding(dimension) for dimension in COMPARE_DIMENSIONS})
+
+        return self.aggregate_cache.get_or_compute(
+            ('compare', self.version, self.cache_key(selections_a), self.cache_key(selections_b)), compute)
+
+    def rfm(self, selections):
+        # The full-data scores of the customers with a purchase in the
+        # selection.
+        def compute():
+            rfm, codes = self.customer_rfm()
+            return rfm.iloc[np.unique(codes[self.filter_rows(selections)])]
+
+        return self.aggregate_cache.get_or_compute(('rfm', self.cache_key(selections)), compute)
+
+    def top_values(self, column, k, selections, measure=None, how='sum'):
+        codes, labels = self.encodings[column]
+        rows = self.filter_rows(selections)
+        codes = codes[rows]
+
+        counts = np.bincount(codes, minlength=len(labels))
+        if measure is None:
+            values = counts
+        else:
+            values = np.bincount(
+                codes, weights=self.df[measure].to_numpy(dtype=float)[rows], minlength=len(labels))
+            if how == 'mean':
+                values = values / np.maximum(counts, 1)
+
+        top = top_k(values, k, valid=counts > 0)
+        return pd.Series(values[top], index=labels[top], name=column)
+
+    def options(self, dimension):
+        return list(self.cube.levels[dimension])
+
+    def facets(self, dimension, selections, measure=None):
+        values = None
+        if self.filtered():
+            rows = self.filter_rows({})
+            weights = None if measure is None else self.df[measure].to_numpy(dtype=float)[rows]
+            values = np.bincount(
+                self.cube.cells[rows], weights=weights, minlength=self.cube.size)
+        counts = self.cube.facet(dimension, selections, measure, values)
+        return {level: value for level, value in counts.items() if value > 0}
+
+    def selections(self, subscription_status, gender, category, shipping_type, age_group):
+        return dict(zip(FILTER_DIMENSIONS, (subscription_status, gender, category, shipping_type, age_group)))
 
     def subscription_status(self):
-        return ['All'] + self.df['subscription_status'].unique().tolist()
+        return ['All'] + self.options('subscription_status')
 
     def gender(self):
-        return ['All'] + self.df['gender'].unique().tolist()
+        return ['All'] + self.options('gender')
 
     def category(self):
-        return ['All'] + self.df['category'].unique().tolist()
+        return ['All'] + self.options('category')
 
     def age_group(self):
-        return ['All'] + self.df['age_group'].unique().tolist()
+        return ['All'] + self.options('age_group')
 
     def shipping_type(self):
-        return ['All'] + self.df['shipping_type'].unique().tolist()
+        return ['All'] + self.options('shipping_type')
 
+    @coalesced
     def compute_kpis(self, subscription_status, gender, category, shipping_type, age_group):
-        df = self.filter_data(subscription_status, gender,
-                              category, shipping_type, age_group)
-
-        total_revenue = df['purchase_amount'].sum().item()
-        average_order_value = df['purchase_amount'].mean().item()
-        total_customers = df['customer_id'].nunique()
-        average_rating = df['review_rating'].mean().item()
-
-        return total_revenue, average_order_value, total_customers, average_rating
+        kpis = self.backend.aggregate(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), {
+            'total_revenue': ('purchase_amount', 'sum'),
+            'average_order_value': ('purchase_amount', 'mean'),
+            'total_customers': ('customer_id', 'nunique'),
+            'average_rating': ('review_rating', 'mean'),
+        })
+
+        return (kpis['total_revenue'], float(kpis['average_order_value']), kpis['total_customers'],
+                float(kpis['average_rating']))
+
+    @coalesced
+    def compute_kpi_intervals(self, subscription_status, gender, category, shipping_type, age_group):
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['purchase_amount', 'review_rating'])
+
+        amount = self.confidence_intervals(df, 'purchase_amount').iloc[0]
+        rating = self.confidence_intervals(df, 'review_rating').iloc[0]
+
+        return {
+            'total_revenue': (float(amount['lower'] * amount['n']), float(amount['upper'] * amount['n'])),
+            'average_order_value': (float(amount['lower']), float(amount['upper'])),
+            'average_rating': (float(rating['lower']), float(rating['upper'])),
+        }
+
+    def confidence_intervals(self, df, column, by=None):
+        if by is None:
+            return mean_intervals(df[column].to_numpy(dtype=float), n_groups=1)
+
+        codes, labels = pd.factorize(df[by])
+        intervals = mean_intervals(
+            df[column].to_numpy(dtype=float), codes, len(labels))
+        intervals.index = labels
+        return intervals
+
+    def estimate_error(self, axis, values):
+        # Estimates from a sample carry their confidence margins; exact
+        # results have none and get no error bars.
+        margin = values.attrs.get('margin')
+        if margin is None:
+            return {}
+        return {axis: dict(type='data', array=margin.reindex(values.index).fillna(0).to_numpy(),
+                           color='#2d3748', thickness=1.5, width=4)}
+
+    def error_bars(self, intervals):
+        return dict(
+            type='data',
+            array=(intervals['upper'] - intervals['mean']).values,
+            arrayminus=(intervals['mean'] - intervals['lower']).values,
+            color='#2d3748',
+            thickness=1.5,
+            width=4
+        )
 
+    @coalesced
     def create_revenue_by_category(self, subscription_status, gender, category, shipping_type, age_group):
-        revenue_category = self.filter_data(subscription_status, gender, category, shipping_type, age_group).groupby(
-            'category')['purchase_amount'].sum().sort_values(ascending=True)
-
-        fig = go.Figure(go.Bar(
-            x=revenue_category.values,
-            y=revenue_category.index,
-            orientation='h',
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=[f'${x:,.0f}' for x in revenue_category.values],
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Revenue: $%{x:,.2f}<extra></extra>'
+        revenue_category = self.backend.group_aggregate(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group),
+            'category', 'purchase_amount', 'sum').sort_values(ascending=True)
+
+        return figure([{
+            'type': 'bar',
+            'x': revenue_category.values,
+            'y': revenue_category.index.tolist(),
+            'orientation': 'h',
+            **self.estimate_error('error_x', revenue_category),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': [f'${x:,.0f}' for x in revenue_category.values],
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Revenue: $%{x:,.2f}<extra></extra>'
+        }], layout(
+            'Revenue by Category', 400,
+            xaxis=axis('Total Revenue ($)', grid=True),
+            yaxis=axis('Category'),
+            margin={'l': 100, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Revenue by Category',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Total Revenue ($)',
-            yaxis_title='Category',
-            font=dict(size=12),
-            height=400,
-            margin=dict(l=100, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
-
+    @coalesced
     def create_revenue_by_season(self, subscription_status, gender, category, shipping_type, age_group):
-        revenue_season = self.filter_data(subscription_status, gender, category, shipping_type, age_group).groupby(
-            'season')['purchase_amount'].sum().sort_values(ascending=True)
-
-        fig = go.Figure(go.Pie(
-            labels=revenue_season.index,
-            values=revenue_season.values,
-            hole=0.4,
-            marker=dict(colors=COLORS_PALETTE),
-            textinfo='label+percent',
-            textposition='auto',
-            hovertemplate='<b>%{label}</b><br>Revenue: $%{value:,.2f}<br>Percentage: %{percent}<extra></extra>'
-        ))
-
-        fig.update_layout(
-            title={
-                'text': 'Revenue by Season',
-                'x': 0.5,
-                'xanchor': 'center',
-                'y': 0.95,
-                'yanchor': 'top',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            font=dict(size=12),
-            height=450,
-            legend=dict(
-                orientation="h",
-                x=0.5,
-                xanchor="center",
-                y=1.20,
-                yanchor="top"
-            ),
-            margin=dict(
-                t=125
-            )
-        )
-
-        return fig
-
-    def create_purchase_amount_distribution(self, subscription_status, gender, category, shipping_type, age_group):
-        mean_amount = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['purchase_amount'].mean()
-        median_amount = self.filter_data(subscription_status, gender, category, shipping_type, age_group)[
-            'purchase_amount'].median()
-
-        fig = go.Figure()
-
-        fig.add_trace(go.Histogram(
-            x=self.filter_data(
-                subscription_status, gender, category, shipping_type, age_group)['purchase_amount'],
-            nbinsx=20,
-            name='Distribution',
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            opacity=0.75,
-            hovertemplate='Amount: $%{x:.2f}<br>Count: %{y}<extra></extra>'
-        ))
-
-        fig.add_vline(x=mean_amount, line_dash="dash", line_color="#e74c3c", line_width=2,
-                      annotation_text=f"Mean: ${mean_amount:.2f}", annotation_position="top right")
-        fig.add_vline(x=median_amount, line_dash="dot", line_color="#27ae60", line_width=2,
-                      annotation_text=f"Median: ${median_amount:.2f}", annotation_position="bottom right")
-
-        fig.update_layout(
-            title={
-                'text': 'Purchase Amount Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Purchase Amount ($)',
-            yaxis_title='Number of Purchases',
-            font=dict(size=12),
-            height=450,
+        revenue_season = self.backend.group_aggregate(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group),
+            'season', 'purchase_amount', 'sum').sort_values(ascending=True)
+
+        return figure([{
+            'type': 'pie',
+            'labels': revenue_season.index.tolist(),
+            'values': revenue_season.values,
+            'hole': 0.4,
+            'marker': {'colors': COLORS_PALETTE},
+            'textinfo': 'label+percent',
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{label}</b><br>Revenue: $%{value:,.2f}<br>Percentage: %{percent}<extra></extra>'
+        }], layout('Revenue by Season', 450, pie=True))
+
+    @coalesced
+    def create_purchase_amount_distribution(self, subscription_status, gender, category, shipping_type, age_group,
+                                            bins=20):
+        amounts = self.filter_data(
+            subscription_status, gender, category, shipping_type, age_group, ['purchase_amount'])['purchase_amount']
+        mean_amount = amounts.mean()
+        median_amount = amounts.median()
+
+        mean_line, mean_label = vline(mean_amount, f"Mean: ${mean_amount:.2f}", 'top right',
+                                      dash='dash', color='#e74c3c', width=2)
+        median_line, median_label = vline(median_amount, f"Median: ${median_amount:.2f}", 'bottom right',
+                                          dash='dot', color='#27ae60', width=2)
+
+        return figure([{
+            'type': 'histogram',
+            'x': amounts.values,
+            'nbinsx': bins,
+            'name': 'Distribution',
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'opacity': 0.75,
+            'hovertemplate': 'Amount: $%{x:.2f}<br>Count: %{y}<extra></extra>'
+        }], layout(
+            'Purchase Amount Distribution', 450,
+            xaxis=axis('Purchase Amount ($)', grid=True),
+            yaxis=axis('Number of Purchases', grid=True),
             showlegend=False,
-            hovermode='x unified'
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
+            hovermode='x unified',
+            shapes=[mean_line, median_line],
+            annotations=[mean_label, median_label]
+        ))
 
+    @coalesced
     def create_customer_by_age_group(self, subscription_status, gender, category, shipping_type, age_group):
-        age_distribution = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['age_group'].value_counts().reindex(['Young Adult', 'Adult', 'Middle-aged', 'Senior'])
-
-        fig = go.Figure(go.Bar(
-            x=age_distribution.index,
-            y=age_distribution.values,
-            marker=dict(
-                color=COLORS_PALETTE,
-                line=dict(color='white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748", width=1)
-            ),
-            text=age_distribution.values,
-            textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Count: %{y}<extra></extra>'
+        age_distribution = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'age_group').reindex(['Young Adult', 'Adult', 'Middle-aged', 'Senior'])
+
+        return figure([{
+            'type': 'bar',
+            'x': age_distribution.index.tolist(),
+            'y': age_distribution.values,
+            **self.estimate_error('error_y', age_distribution),
+            'marker': {'color': COLORS_PALETTE,
+                       'line': {'color': title_color(), 'width': 1}},
+            'text': age_distribution.values,
+            'textposition': 'outside',
+            'hovertemplate': '<b>%{x}</b><br>Count: %{y}<extra></extra>'
+        }], layout(
+            'Customer Distribution by Age Group', 450,
+            xaxis=axis('Age Group'),
+            yaxis=axis('Number of Customers', grid=True)
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Customer Distribution by Age Group',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Age Group',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_gender_distribution(self, subscription_status, gender, category, shipping_type, age_group):
-        gender_count = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['gender'].value_counts()
-
-        fig = go.Figure(go.Pie(
-            labels=gender_count.index,
-            values=gender_count.values,
-            marker=dict(colors=[PRIMARY_COLOR, SECONDARY_COLOR]),
-            textinfo='label+percent+value',
-            textposition='auto',
-            hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
-        ))
-
-        fig.update_layout(
-            title={
-                'text': 'Gender Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'y': 0.95,
-                'yanchor': 'top',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            font=dict(size=12),
-            height=450,
-            legend=dict(
-                orientation="h",
-                x=0.5,
-                xanchor="center",
-                y=1.20,
-                yanchor="top"
-            ),
-            margin=dict(
-                t=125
-            )
-        )
-
-        return fig
-
+        gender_count = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'gender')
+
+        return figure([{
+            'type': 'pie',
+            'labels': gender_count.index.tolist(),
+            'values': gender_count.values,
+            'marker': {'colors': [PRIMARY_COLOR, SECONDARY_COLOR]},
+            'textinfo': 'label+percent+value',
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
+        }], layout('Gender Distribution', 450, pie=True))
+
+    @coalesced
     def create_customer_count_age_group(self, subscription_status, gender, category, shipping_type, age_group):
-        age_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['age_group'].value_counts().reindex(['Young Adult', 'Adult', 'Middle-aged', 'Senior'])
-
-        fig = go.Figure(go.Bar(
-            x=age_counts.index,
-            y=age_counts.values,
-            marker=dict(
-                color=[PRIMARY_COLOR, SECONDARY_COLOR,
-                       ACCENT_COLOR, '#6b2d73'],
-                line=dict(color='white', width=1)
-            ),
-            text=age_counts.values,
-            textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Customers: %{y}<extra></extra>'
+        age_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'age_group').reindex(['Young Adult', 'Adult', 'Middle-aged', 'Senior'])
+
+        return figure([{
+            'type': 'bar',
+            'x': age_counts.index.tolist(),
+            'y': age_counts.values,
+            **self.estimate_error('error_y', age_counts),
+            'marker': {'color': [PRIMARY_COLOR, SECONDARY_COLOR, ACCENT_COLOR, '#6b2d73'],
+                       'line': BAR_OUTLINE},
+            'text': age_counts.values,
+            'textposition': 'outside',
+            'hovertemplate': '<b>%{x}</b><br>Customers: %{y}<extra></extra>'
+        }], layout(
+            'Customer Count by Age Group', 450,
+            xaxis=axis('Age Group'),
+            yaxis=axis('Number of Customers', grid=True)
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Customer Count by Age Group',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Age Group',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
-
+    @coalesced
     def create_purchase_by_age_boxplot(self, subscription_status, gender, category, shipping_type, age_group):
         age_order = ['Young Adult', 'Adult', 'Middle-aged', 'Senior']
 
-        fig = go.Figure()
-
-        for i, age_group in enumerate(age_order):
-            data = self.filter_data(
-                subscription_status, gender, category, shipping_type, age_group)[self.filter_data(
-                    subscription_status, gender, category, shipping_type, age_group)['age_group'] == age_group]['purchase_amount']
-            fig.add_trace(go.Box(
-                y=data,
-                name=age_group,
-                marker=dict(color=COLORS_PALETTE[i]),
-                boxmean='sd',
-                hovertemplate='<b>%{fullData.name}</b><br>Value: $%{y:.2f}<extra></extra>'
-            ))
-
-        fig.update_layout(
-            title={
-                'text': 'Purchase Amount by Age Group',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            yaxis_title='Purchase Amount ($)',
-            xaxis_title='Age Group',
-            font=dict(size=12),
-            height=500,
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['age_group', 'purchase_amount'])
+
+        return figure([{
+            'type': 'box',
+            'y': df.loc[df['age_group'] == group, 'purchase_amount'].values,
+            'name': group,
+            'marker': {'color': COLORS_PALETTE[i]},
+            'boxmean': 'sd',
+            'hovertemplate': '<b>%{fullData.name}</b><br>Value: $%{y:.2f}<extra></extra>'
+        } for i, group in enumerate(age_order)], layout(
+            'Purchase Amount by Age Group', 500,
+            xaxis=axis('Age Group'),
+            yaxis=axis('Purchase Amount ($)', grid=True),
             showlegend=False
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
-
-    def create_previous_purchases_distribution(self, subscription_status, gender, category, shipping_type, age_group):
-        fig = go.Figure(go.Histogram(
-            x=self.filter_data(
-                subscription_status, gender, category, shipping_type, age_group)['previous_purchases'],
-            nbinsx=15,
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            opacity=0.75,
-            hovertemplate='Previous Purchases: %{x}<br>Count: %{y}<extra></extra>'
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Previous Purchases Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Number of Previous Purchases',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
+    @coalesced
+    def create_previous_purchases_distribution(self, subscription_status, gender, category, shipping_type, age_group,
+                                               bins=15):
+        return figure([{
+            'type': 'histogram',
+            'x': self.filter_data(
+                subscription_status, gender, category, shipping_type, age_group, ['previous_purchases'])['previous_purchases'].values,
+            'nbinsx': bins,
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'opacity': 0.75,
+            'hovertemplate': 'Previous Purchases: %{x}<br>Count: %{y}<extra></extra>'
+        }], layout(
+            'Previous Purchases Distribution', 450,
+            xaxis=axis('Number of Previous Purchases', grid=True),
+            yaxis=axis('Number of Customers', grid=True)
+        ))
 
+    @coalesced
     def create_review_rating_distribution(self, subscription_status, gender, category, shipping_type, age_group):
-        rating_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['review_rating'].value_counts().sort_index()
+        rating_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'review_rating').sort_index()
 
         colors = ['#e74c3c' if x < 3 else '#f39c12' if x <
                   4 else '#27ae60' for x in rating_counts.index]
 
-        fig = go.Figure(go.Bar(
-            x=rating_counts.index,
-            y=rating_counts.values,
-            marker=dict(
-                color=colors,
-                line=dict(color='white', width=1)
-            ),
-            text=rating_counts.values,
-            textposition='outside',
-            hovertemplate='Rating: %{x}<br>Count: %{y}<extra></extra>'
+        return figure([{
+            'type': 'bar',
+            'x': rating_counts.index.values,
+            'y': rating_counts.values,
+            **self.estimate_error('error_y', rating_counts),
+            'marker': {'color': colors, 'line': BAR_OUTLINE},
+            'text': rating_counts.values,
+            'textposition': 'outside',
+            'hovertemplate': 'Rating: %{x}<br>Count: %{y}<extra></extra>'
+        }], layout(
+            'Review Rating Distribution', 450,
+            xaxis=axis('Rating'),
+            yaxis=axis('Number of Reviews', grid=True)
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Review Rating Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Rating',
-            yaxis_title='Number of Reviews',
-            font=dict(size=12),
-            height=450
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
-
-    def create_top_10_items(self, subscription_status, gender, category, shipping_type, age_group):
-        top_items = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['item_purchased'].value_counts().head(10).sort_values(ascending=True)
-
-        fig = go.Figure(go.Bar(
-            x=top_items.values,
-            y=top_items.index,
-            orientation='h',
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=top_items.values,
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Count: %{x}<extra></extra>'
+    @coalesced
+    def create_top_10_items(self, subscription_status, gender, category, shipping_type, age_group, top_n=10):
+        top_items = self.top_values('item_purchased', top_n, self.selections(
+            subscription_status, gender, category, shipping_type, age_group)).iloc[::-1]
+
+        return figure([{
+            'type': 'bar',
+            'x': top_items.values,
+            'y': top_items.index.tolist(),
+            'orientation': 'h',
+            **self.estimate_error('error_x', top_items),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': top_items.values,
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Count: %{x}<extra></extra>'
+        }], layout(
+            f'Top {top_n} Items Purchased', 450,
+            xaxis=axis('Number of Purchases', grid=True),
+            yaxis=axis('Item'),
+            margin={'l': 120, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Top 10 Items Purchased',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Number of Purchases',
-            yaxis_title='Item',
-            font=dict(size=12),
-            height=450,
-            margin=dict(l=120, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_category_treemap(self, subscription_status, gender, category, shipping_type, age_group):
-        category_item_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby(['category', 'item_purchased']).size().reset_index(name='count')
-
-        fig = px.treemap(
-            category_item_counts,
-            path=['category', 'item_purchased'],
-            values='count',
-            title='Category Breakdown',
-            color='count',
-            color_continuous_scale=['#f0e6f5',
-                                    '#d8b4e2', '#a855b8', '#7b3785', '#4a1f52']
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Category Breakdown',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            font=dict(size=12),
-            height=500
-        )
-
-        return fig
+        category_item_counts = self.backend.group_size(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), ['category', 'item_purchased'])
+
+        return figure([treemap(category_item_counts, 'category', 'item_purchased', 'count')], layout(
+            'Category Breakdown', 500,
+            coloraxis={'colorbar': {'title': {'text': 'count'}},
+                       'colorscale': [[0.0, '#f0e6f5'], [0.25, '#d8b4e2'], [0.5, '#a855b8'],
+                                      [0.75, '#7b3785'], [1.0, '#4a1f52']],
+                       'autocolorscale': False},
+            legend={'tracegroupgap': 0}
+        ))
 
+    @coalesced
     def create_avg_rating_by_category(self, subscription_status, gender, category, shipping_type, age_group):
-        avg_rating = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby('category')['review_rating'].mean().sort_values(ascending=False)
-        overall_avg = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['review_rating'].mean()
-
-        fig = go.Figure()
-
-        fig.add_trace(go.Bar(
-            x=avg_rating.index,
-            y=avg_rating.values,
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=[f'{x:.2f}⭐' for x in avg_rating.values],
-            textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Avg Rating: %{y:.2f}⭐<extra></extra>'
+        df = self.filter_data(
+            subscription_status, gender, category, shipping_type, age_group, ['category', 'review_rating'])
+        avg_rating = df.groupby('category')['review_rating'].mean().sort_values(ascending=False)
+        overall_avg = df['review_rating'].mean()
+        intervals = self.confidence_intervals(
+            df, 'review_rating', 'category').reindex(avg_rating.index)
+
+        overall_line, overall_label = hline(overall_avg, f"Overall Avg: {overall_avg:.2f}⭐",
+                                            dash='dash', color='#e74c3c')
+
+        return figure([{
+            'type': 'bar',
+            'x': avg_rating.index.tolist(),
+            'y': avg_rating.values,
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'error_y': self.error_bars(intervals),
+            'customdata': intervals[['lower', 'upper']].values,
+            'text': [f'{x:.2f}⭐' for x in avg_rating.values],
+            'textposition': 'outside',
+            'hovertemplate': '<b>%{x}</b><br>Avg Rating: %{y:.2f}⭐<br>95% CI: %{customdata[0]:.2f} – %{customdata[1]:.2f}<extra></extra>'
+        }], layout(
+            'Average Rating by Category', 450,
+            xaxis=axis('Category'),
+            yaxis=axis('Average Rating', grid=True, range=[0, 5]),
+            shapes=[overall_line],
+            annotations=[overall_label]
         ))
 
-        fig.add_hline(y=overall_avg, line_dash="dash", line_color="#e74c3c",
-                      annotation_text=f"Overall Avg: {overall_avg:.2f}⭐", annotation_position="right")
-
-        fig.update_layout(
-            title={
-                'text': 'Average Rating by Category',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Category',
-            yaxis_title='Average Rating',
-            font=dict(size=12),
-            height=450,
-            yaxis=dict(range=[0, 5])
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_category_by_season(self, subscription_status, gender, category, shipping_type, age_group):
-        season_category = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby(['season', 'category']).size().reset_index(name='count')
-
-        fig = px.bar(
-            season_category,
-            x='season',
-            y='count',
-            color='category',
-            title='Product Category by Season',
-            barmode='stack',
-            color_discrete_sequence=COLORS_PALETTE,
-            category_orders={'season': ['Spring', 'Summer', 'Fall', 'Winter']}
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Product Category by Season',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Season',
-            yaxis_title='Number of Purchases',
-            font=dict(size=12),
-            height=450,
-            legend_title='Category'
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
-    def create_size_distribution(self, subscription_status, gender, category, shipping_type, age_group):
-        size_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['size'].value_counts()
-
-        fig = go.Figure(go.Pie(
-            labels=size_counts.index,
-            values=size_counts.values,
-            marker=dict(colors=COLORS_PALETTE),
-            textinfo='label+percent',
-            hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
+        season_category = self.backend.group_size(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), ['season', 'category'])
+
+        data, xaxis = color_bars(season_category, 'season', 'count', 'category', 'stack',
+                                 colors=COLORS_PALETTE,
+                                 category_orders={'season': ['Spring', 'Summer', 'Fall', 'Winter']})
+        xaxis['title'] = {'text': 'Season'}
+
+        return figure(data, layout(
+            'Product Category by Season', 450,
+            xaxis=xaxis,
+            yaxis={**PX_YAXIS, **axis('Number of Purchases', grid=True)},
+            legend={'title': {'text': 'Category'}, 'tracegroupgap': 0},
+            barmode='stack'
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Size Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'y': 0.95,
-                'yanchor': 'top',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            font=dict(size=12),
-            height=450,
-            legend=dict(
-                orientation="h",
-                x=0.5,
-                xanchor="center",
-                y=1.20,
-                yanchor="top"
-            ),
-            margin=dict(
-                t=125
-            )
-        )
-
-        return fig
-
+    @coalesced
+    def create_size_distribution(self, subscription_status, gender, category, shipping_type, age_group):
+        size_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'size')
+
+        return figure([{
+            'type': 'pie',
+            'labels': size_counts.index.tolist(),
+            'values': size_counts.values,
+            'marker': {'colors': COLORS_PALETTE},
+            'textinfo': 'label+percent',
+            'hovertemplate': '<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
+        }], layout('Size Distribution', 450, pie=True))
+
+    @coalesced
     def create_top_colors(self, subscription_status, gender, category, shipping_type, age_group):
-        top_colors = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['color'].value_counts().head(10).sort_values(ascending=True)
-
-        fig = go.Figure(go.Bar(
-            x=top_colors.values,
-            y=top_colors.index,
-            orientation='h',
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=top_colors.values,
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Count: %{x}<extra></extra>'
+        top_colors = self.top_values('color', 10, self.selections(
+            subscription_status, gender, category, shipping_type, age_group)).iloc[::-1]
+
+        return figure([{
+            'type': 'bar',
+            'x': top_colors.values,
+            'y': top_colors.index.tolist(),
+            'orientation': 'h',
+            **self.estimate_error('error_x', top_colors),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': top_colors.values,
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Count: %{x}<extra></extra>'
+        }], layout(
+            'Top 10 Colors Purchased', 450,
+            xaxis=axis('Number of Purchases', grid=True),
+            yaxis=axis('Color'),
+            margin={'l': 100, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Top 10 Colors Purchased',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Number of Purchases',
-            yaxis_title='Color',
-            font=dict(size=12),
-            height=450,
-            margin=dict(l=100, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_purchase_frequency(self, subscription_status, gender, category, shipping_type, age_group):
         freq_order = ['Weekly', 'Bi-Weekly', 'Fortnightly',
                       'Monthly', 'Quarterly', 'Every 3 Months', 'Annually']
-        freq_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['frequency_of_purchases'].value_counts().reindex(freq_order, fill_value=0)
-
-        fig = go.Figure(go.Bar(
-            x=freq_counts.index,
-            y=freq_counts.values,
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=freq_counts.values,
-            textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Count: %{y}<extra></extra>'
+        freq_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'frequency_of_purchases').reindex(freq_order, fill_value=0)
+
+        return figure([{
+            'type': 'bar',
+            'x': freq_counts.index.tolist(),
+            'y': freq_counts.values,
+            **self.estimate_error('error_y', freq_counts),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': freq_counts.values,
+            'textposition': 'outside',
+            'hovertemplate': '<b>%{x}</b><br>Count: %{y}<extra></extra>'
+        }], layout(
+            'Purchase Frequency Distribution', 450,
+            xaxis=axis('Frequency', tickangle=-45),
+            yaxis=axis('Number of Customers', grid=True)
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Purchase Frequency Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Frequency',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450,
-            xaxis_tickangle=-45
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_payment_methods(self, subscription_status, gender, category, shipping_type, age_group):
-        payment_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['payment_method'].value_counts().sort_values(ascending=True)
-
-        fig = go.Figure(go.Bar(
-            x=payment_counts.values,
-            y=payment_counts.index,
-            orientation='h',
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=payment_counts.values,
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Count: %{x}<extra></extra>'
+        payment_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'payment_method').sort_values(ascending=True)
+
+        return figure([{
+            'type': 'bar',
+            'x': payment_counts.values,
+            'y': payment_counts.index.tolist(),
+            'orientation': 'h',
+            **self.estimate_error('error_x', payment_counts),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': payment_counts.values,
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Count: %{x}<extra></extra>'
+        }], layout(
+            'Payment Method Preferences', 450,
+            xaxis=axis('Number of Transactions', grid=True),
+            yaxis=axis('Payment Method'),
+            margin={'l': 120, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Payment Method Preferences',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Number of Transactions',
-            yaxis_title='Payment Method',
-            font=dict(size=12),
-            height=450,
-            margin=dict(l=120, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_subscription_comparison(self, subscription_status, gender, category, shipping_type, age_group):
-        subscription_data = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby(['subscription_status', 'category']).size().reset_index(name='count')
-
-        fig = px.bar(
-            subscription_data,
-            x='category',
-            y='count',
-            color='subscription_status',
-            title='Subscription Status by Category',
-            barmode='group',
-            color_discrete_map={'Yes': PRIMARY_COLOR, 'No': SECONDARY_COLOR}
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Subscription vs Non-Subscription by Category',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Category',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450,
-            legend_title='Subscription'
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
+        subscription_data = self.backend.group_size(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), ['subscription_status', 'category'])
+
+        data, xaxis = color_bars(subscription_data, 'category', 'count', 'subscription_status', 'group',
+                                 color_map={'Yes': PRIMARY_COLOR, 'No': SECONDARY_COLOR})
+        xaxis['title'] = {'text': 'Category'}
+
+        return figure(data, layout(
+            'Subscription vs Non-Subscription by Category', 450,
+            xaxis=xaxis,
+            yaxis={**PX_YAXIS, **axis('Number of Customers', grid=True)},
+            legend={'title': {'text': 'Subscription'}, 'tracegroupgap': 0},
+            barmode='group'
+        ))
 
+    @coalesced
     def create_discount_impact(self, subscription_status, gender, category, shipping_type, age_group):
-        discount_data = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby('discount_applied')['purchase_amount'].agg(['mean', 'count']).reset_index()
-
-        fig = go.Figure()
-
-        for discount in discount_data['discount_applied']:
-            data = self.filter_data(
-                subscription_status, gender, category, shipping_type, age_group)[self.filter_data(
-                    subscription_status, gender, category, shipping_type, age_group)['discount_applied'] == discount]['purchase_amount']
-            fig.add_trace(go.Box(
-                y=data,
-                name=f'Discount: {discount}',
-                marker=dict(color=PRIMARY_COLOR if discount ==
-                            'Yes' else SECONDARY_COLOR),
-                boxmean='sd',
-                hovertemplate='Value: $%{y:.2f}<extra></extra>'
-            ))
-
-        fig.update_layout(
-            title={
-                'text': 'Discount Impact on Purchase Amount',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            yaxis_title='Purchase Amount ($)',
-            xaxis_title='Discount Applied',
-            font=dict(size=12),
-            height=450,
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['discount_applied', 'purchase_amount'])
+        discount_data = df.groupby('discount_applied')['purchase_amount'].agg(['mean', 'count']).reset_index()
+
+        return figure([{
+            'type': 'box',
+            'y': df.loc[df['discount_applied'] == discount, 'purchase_amount'].values,
+            'name': f'Discount: {discount}',
+            'marker': {'color': PRIMARY_COLOR if discount == 'Yes' else SECONDARY_COLOR},
+            'boxmean': 'sd',
+            'hovertemplate': 'Value: $%{y:.2f}<extra></extra>'
+        } for discount in discount_data['discount_applied']], layout(
+            'Discount Impact on Purchase Amount', 450,
+            xaxis=axis('Discount Applied'),
+            yaxis=axis('Purchase Amount ($)', grid=True),
             showlegend=False
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
+        ))
 
+    @coalesced
     def create_purchase_frequency_days(self, subscription_status, gender, category, shipping_type, age_group):
-        freq_days_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['purchase_frequency_days'].value_counts().sort_index()
-
-        fig = go.Figure(go.Bar(
-            x=freq_days_counts.index,
-            y=freq_days_counts.values,
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=freq_days_counts.values,
-            textposition='outside',
-            hovertemplate='Days: %{x}<br>Count: %{y}<extra></extra>'
+        freq_days_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'purchase_frequency_days').sort_index()
+
+        return figure([{
+            'type': 'bar',
+            'x': freq_days_counts.index.values,
+            'y': freq_days_counts.values,
+            **self.estimate_error('error_y', freq_days_counts),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': freq_days_counts.values,
+            'textposition': 'outside',
+            'hovertemplate': 'Days: %{x}<br>Count: %{y}<extra></extra>'
+        }], layout(
+            'Purchase Frequency (Days)', 450,
+            xaxis=axis('Days Between Purchases'),
+            yaxis=axis('Number of Customers', grid=True)
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Purchase Frequency (Days)',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Days Between Purchases',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_shipping_distribution(self, subscription_status, gender, category, shipping_type, age_group):
-        shipping_counts = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['shipping_type'].value_counts()
-
-        fig = go.Figure(go.Pie(
-            labels=shipping_counts.index,
-            values=shipping_counts.values,
-            hole=0.4,
-            marker=dict(colors=GRADIENT_COLORS),
-            textinfo='label+percent',
-            hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
-        ))
-
-        fig.update_layout(
-            title={
-                'text': 'Shipping Type Distribution',
-                'x': 0.5,
-                'xanchor': 'center',
-                'y': 0.95,
-                'yanchor': 'top',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            font=dict(size=12),
-            height=450,
-            legend=dict(
-                orientation="h",
-                x=0.5,
-                xanchor="center",
-                y=1.20,
-                yanchor="top"
-            ),
-            margin=dict(
-                t=125
-            )
-        )
-
-        return fig
-
+        shipping_counts = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'shipping_type')
+
+        return figure([{
+            'type': 'pie',
+            'labels': shipping_counts.index.tolist(),
+            'values': shipping_counts.values,
+            'hole': 0.4,
+            'marker': {'colors': GRADIENT_COLORS},
+            'textinfo': 'label+percent',
+            'hovertemplate': '<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percent}<extra></extra>'
+        }], layout('Shipping Type Distribution', 450, pie=True))
+
+    @coalesced
     def create_avg_purchase_by_shipping(self, subscription_status, gender, category, shipping_type, age_group):
-        avg_by_shipping = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby('shipping_type')['purchase_amount'].mean().sort_values(ascending=False)
-
-        fig = go.Figure(go.Bar(
-            x=avg_by_shipping.index,
-            y=avg_by_shipping.values,
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=[f'${x:.2f}' for x in avg_by_shipping.values],
-            textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Avg Purchase: $%{y:.2f}<extra></extra>'
+        df = self.filter_data(
+            subscription_status, gender, category, shipping_type, age_group, ['shipping_type', 'purchase_amount'])
+        avg_by_shipping = df.groupby('shipping_type')['purchase_amount'].mean().sort_values(ascending=False)
+        intervals = self.confidence_intervals(
+            df, 'purchase_amount', 'shipping_type').reindex(avg_by_shipping.index)
+
+        return figure([{
+            'type': 'bar',
+            'x': avg_by_shipping.index.tolist(),
+            'y': avg_by_shipping.values,
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'error_y': self.error_bars(intervals),
+            'customdata': intervals[['lower', 'upper']].values,
+            'text': [f'${x:.2f}' for x in avg_by_shipping.values],
+            'textposition': 'outside',
+            'hovertemplate': '<b>%{x}</b><br>Avg Purchase: $%{y:.2f}<br>95% CI: $%{customdata[0]:.2f} – $%{customdata[1]:.2f}<extra></extra>'
+        }], layout(
+            'Average Purchase Amount by Shipping Type', 450,
+            xaxis=axis('Shipping Type', tickangle=-45),
+            yaxis=axis('Average Purchase Amount ($)', grid=True)
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Average Purchase Amount by Shipping Type',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Shipping Type',
-            yaxis_title='Average Purchase Amount ($)',
-            font=dict(size=12),
-            height=450,
-            xaxis_tickangle=-45
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
+    @coalesced
     def create_shipping_by_category(self, subscription_status, gender, category, shipping_type, age_group):
-        shipping_category = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby(['shipping_type', 'category']).size().reset_index(name='count')
-
-        fig = px.bar(
-            shipping_category,
-            x='shipping_type',
-            y='count',
-            color='category',
-            title='Shipping Type by Category',
-            barmode='stack',
-            color_discrete_sequence=COLORS_PALETTE
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Shipping Type by Category',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Shipping Type',
-            yaxis_title='Number of Purchases',
-            font=dict(size=12),
-            height=450,
-            legend_title='Category',
-            xaxis_tickangle=-45
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        return fig
+        shipping_category = self.backend.group_size(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), ['shipping_type', 'category'])
+
+        data, xaxis = color_bars(shipping_category, 'shipping_type', 'count', 'category', 'stack',
+                                 colors=COLORS_PALETTE)
+        xaxis.update(title={'text': 'Shipping Type'}, tickangle=-45)
+
+        return figure(data, layout(
+            'Shipping Type by Category', 450,
+            xaxis=xaxis,
+            yaxis={**PX_YAXIS, **axis('Number of Purchases', grid=True)},
+            legend={'title': {'text': 'Category'}, 'tracegroupgap': 0},
+            barmode='stack'
+        ))
 
+    @coalesced
     def create_subscription_shipping(self, subscription_status, gender, category, shipping_type, age_group):
-        sub_shipping = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby(
-            ['subscription_status', 'shipping_type']).size().reset_index(name='count')
-
-        fig = px.bar(
-            sub_shipping,
-            x='shipping_type',
-            y='count',
-            color='subscription_status',
-            title='Subscription Status vs Shipping Preference',
-            barmode='group',
-            color_discrete_map={'Yes': PRIMARY_COLOR, 'No': SECONDARY_COLOR}
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Subscription Status vs Shipping Preference',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Shipping Type',
-            yaxis_title='Number of Customers',
-            font=dict(size=12),
-            height=450,
-            legend_title='Subscription',
-            xaxis_tickangle=-45
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
-    def create_top_states_revenue(self, subscription_status, gender, category, shipping_type, age_group):
-        state_revenue = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby('location')['purchase_amount'].sum().sort_values(ascending=True).tail(15)
-
-        fig = go.Figure(go.Bar(
-            x=state_revenue.values,
-            y=state_revenue.index,
-            orientation='h',
-            marker=dict(
-                color=PRIMARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=[f'${x:,.0f}' for x in state_revenue.values],
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Revenue: $%{x:,.2f}<extra></extra>'
+        sub_shipping = self.backend.group_size(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), ['subscription_status', 'shipping_type'])
+
+        data, xaxis = color_bars(sub_shipping, 'shipping_type', 'count', 'subscription_status', 'group',
+                                 color_map={'Yes': PRIMARY_COLOR, 'No': SECONDARY_COLOR})
+        xaxis.update(title={'text': 'Shipping Type'}, tickangle=-45)
+
+        return figure(data, layout(
+            'Subscription Status vs Shipping Preference', 450,
+            xaxis=xaxis,
+            yaxis={**PX_YAXIS, **axis('Number of Customers', grid=True)},
+            legend={'title': {'text': 'Subscription'}, 'tracegroupgap': 0},
+            barmode='group'
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Top 15 States by Revenue',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Total Revenue ($)',
-            yaxis_title='State',
-            font=dict(size=12),
-            height=600,
-            margin=dict(l=120, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
-    def create_top_states_customers(self, subscription_status, gender, category, shipping_type, age_group):
-        state_customers = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)['location'].value_counts().sort_values(ascending=True).tail(15)
-
-        fig = go.Figure(go.Bar(
-            x=state_customers.values,
-            y=state_customers.index,
-            orientation='h',
-            marker=dict(
-                color=SECONDARY_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=state_customers.values,
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Customers: %{x}<extra></extra>'
+    @coalesced
+    def create_top_states_revenue(self, subscription_status, gender, category, shipping_type, age_group, top_n=15):
+        state_revenue = self.top_values('location', top_n, self.selections(
+            subscription_status, gender, category, shipping_type, age_group), 'purchase_amount').iloc[::-1]
+
+        return figure([{
+            'type': 'bar',
+            'x': state_revenue.values,
+            'y': state_revenue.index.tolist(),
+            'orientation': 'h',
+            **self.estimate_error('error_x', state_revenue),
+            'marker': {'color': PRIMARY_COLOR, 'line': BAR_OUTLINE},
+            'text': [f'${x:,.0f}' for x in state_revenue.values],
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Revenue: $%{x:,.2f}<extra></extra>'
+        }], layout(
+            f'Top {top_n} States by Revenue', 600,
+            xaxis=axis('Total Revenue ($)', grid=True),
+            yaxis=axis('State'),
+            margin={'l': 120, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Top 15 States by Customer Count',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Number of Customers',
-            yaxis_title='State',
-            font=dict(size=12),
-            height=600,
-            margin=dict(l=120, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
-    def create_avg_purchase_by_state(self, subscription_status, gender, category, shipping_type, age_group):
-        state_avg = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group).groupby('location')['purchase_amount'].mean(
-        ).sort_values(ascending=True).tail(15)
-
-        fig = go.Figure(go.Bar(
-            x=state_avg.values,
-            y=state_avg.index,
-            orientation='h',
-            marker=dict(
-                color=ACCENT_COLOR,
-                line=dict(color='white', width=1)
-            ),
-            text=[f'${x:.2f}' for x in state_avg.values],
-            textposition='auto',
-            hovertemplate='<b>%{y}</b><br>Avg Purchase: $%{x:.2f}<extra></extra>'
+    @coalesced
+    def create_top_states_customers(self, subscription_status, gender, category, shipping_type, age_group, top_n=15):
+        state_customers = self.top_values('location', top_n, self.selections(
+            subscription_status, gender, category, shipping_type, age_group)).iloc[::-1]
+
+        return figure([{
+            'type': 'bar',
+            'x': state_customers.values,
+            'y': state_customers.index.tolist(),
+            'orientation': 'h',
+            **self.estimate_error('error_x', state_customers),
+            'marker': {'color': SECONDARY_COLOR, 'line': BAR_OUTLINE},
+            'text': state_customers.values,
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Customers: %{x}<extra></extra>'
+        }], layout(
+            f'Top {top_n} States by Customer Count', 600,
+            xaxis=axis('Number of Customers', grid=True),
+            yaxis=axis('State'),
+            margin={'l': 120, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Top 15 States by Average Purchase Amount',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Average Purchase Amount ($)',
-            yaxis_title='State',
-            font=dict(size=12),
-            height=600,
-            margin=dict(l=120, r=40, t=80, b=60)
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
-    def create_correlation_heatmap(self, subscription_status, gender, category, shipping_type, age_group):
-        numerical_cols = ['age', 'purchase_amount', 'review_rating',
-                          'previous_purchases', 'purchase_frequency_days']
-        corr_matrix = self.filter_data(
-            subscription_status, gender, category, shipping_type, age_group)[numerical_cols].corr()
-
-        fig = go.Figure(go.Heatmap(
-            z=corr_matrix.values,
-            x=corr_matrix.columns,
-            y=corr_matrix.columns,
-            colorscale=[[0, '#f0e6f5'], [0.5, '#7b3785'], [1, '#4a1f52']],
-            text=np.round(corr_matrix.values, 2),
-            texttemplate='%{text}',
-            textfont={"size": 10},
-            hovertemplate='%{y} vs %{x}<br>Correlation: %{z:.2f}<extra></extra>'
+    @coalesced
+    def create_avg_purchase_by_state(self, subscription_status, gender, category, shipping_type, age_group, top_n=15):
+        state_avg = self.top_values('location', top_n, self.selections(
+            subscription_status, gender, category, shipping_type, age_group), 'purchase_amount', how='mean').iloc[::-1]
+
+        return figure([{
+            'type': 'bar',
+            'x': state_avg.values,
+            'y': state_avg.index.tolist(),
+            'orientation': 'h',
+            'marker': {'color': ACCENT_COLOR, 'line': BAR_OUTLINE},
+            'text': [f'${x:.2f}' for x in state_avg.values],
+            'textposition': 'auto',
+            'hovertemplate': '<b>%{y}</b><br>Avg Purchase: $%{x:.2f}<extra></extra>'
+        }], layout(
+            f'Top {top_n} States by Average Purchase Amount', 600,
+            xaxis=axis('Average Purchase Amount ($)', grid=True),
+            yaxis=axis('State'),
+            margin={'l': 120, 'r': 40, 't': 80, 'b': 60}
         ))
 
-        fig.update_layout(
-            title={
-                'text': 'Correlation Heatmap',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            font=dict(size=12),
-            height=500,
+    @coalesced
+    def create_correlation_heatmap(self, subscription_status, gender, category, shipping_type, age_group):
+        if self.filtered():
+            corr_matrix = self.filter_data(
+                subscription_status, gender, category, shipping_type, age_group, self.cube.measures).corr()
+        else:
+            corr_matrix = self.cube.correlation(self.selections(
+                subscription_status, gender, category, shipping_type, age_group))
+
+        return figure([{
+            'type': 'heatmap',
+            'z': corr_matrix.values,
+            'x': corr_matrix.columns.tolist(),
+            'y': corr_matrix.columns.tolist(),
+            'colorscale': HEATMAP_COLORSCALE,
+            'text': np.round(corr_matrix.values, 2),
+            'texttemplate': '%{text}',
+            'textfont': {'size': 10},
+            'hovertemplate': '%{y} vs %{x}<br>Correlation: %{z:.2f}<extra></extra>'
+        }], layout(
+            'Correlation Heatmap', 500,
             xaxis={'side': 'bottom'},
             yaxis={'side': 'left'}
-        )
-
-        return fig
-
-    def create_age_vs_purchase(self, subscription_status, gender, category, shipping_type, age_group):
-        df = self.filter_data(subscription_status, gender,
-                              category, shipping_type, age_group)
-        fig = px.scatter(
-            df,
-            x='age',
-            y='purchase_amount',
-            color='gender',
-            title='Age vs Purchase Amount',
-            trendline='ols',
-            color_discrete_map={'Male': PRIMARY_COLOR,
-                                'Female': SECONDARY_COLOR},
-            opacity=0.6
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Age vs Purchase Amount',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Age',
-            yaxis_title='Purchase Amount ($)',
-            font=dict(size=12),
-            height=500
-        )
-
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
-
-    def create_previous_vs_current(self, subscription_status, gender, category, shipping_type, age_group):
-        df = self.filter_data(subscription_status, gender,
-                              category, shipping_type, age_group)
-
-        fig = px.scatter(
-            df,
-            x='previous_purchases',
-            y='purchase_amount',
-            color='subscription_status',
-            title='Previous Purchases vs Current Purchase Amount',
-            trendline='ols',
-            color_discrete_map={'Yes': PRIMARY_COLOR, 'No': SECONDARY_COLOR},
-            opacity=0.6
-        )
-
-        fig.update_layout(
-            title={
-                'text': 'Previous Purchases vs Current Purchase Amount',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Previous Purchases',
-            yaxis_title='Current Purchase Amount ($)',
-            font=dict(size=12),
-            height=500,
-            legend_title='Subscription'
-        )
+        ))
 
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
+    @coalesced
+    def create_age_vs_purchase(self, subscription_status, gender, category, shipping_type, age_group, trendline=True):
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['age', 'purchase_amount', 'gender'])
+
+        return figure(trendline_scatter(
+            df, 'age', 'purchase_amount', 'gender',
+            {'Male': PRIMARY_COLOR, 'Female': SECONDARY_COLOR}, opacity=0.6, trendline=trendline
+        ), layout(
+            'Age vs Purchase Amount', 500,
+            xaxis={**PX_AXIS, **axis('Age', grid=True)},
+            yaxis={**PX_YAXIS, **axis('Purchase Amount ($)', grid=True)},
+            legend={'title': {'text': 'gender'}, 'tracegroupgap': 0}
+        ))
 
-        return fig
+    @coalesced
+    def create_previous_vs_current(self, subscription_status, gender, category, shipping_type, age_group, trendline=True):
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['previous_purchases', 'purchase_amount', 'subscription_status'])
+
+        return figure(trendline_scatter(
+            df, 'previous_purchases', 'purchase_amount', 'subscription_status',
+            {'Yes': PRIMARY_COLOR, 'No': SECONDARY_COLOR}, opacity=0.6, trendline=trendline
+        ), layout(
+            'Previous Purchases vs Current Purchase Amount', 500,
+            xaxis={**PX_AXIS, **axis('Previous Purchases', grid=True)},
+            yaxis={**PX_YAXIS, **axis('Current Purchase Amount ($)', grid=True)},
+            legend={'title': {'text': 'Subscription'}, 'tracegroupgap': 0}
+        ))
 
+    @coalesced
     def create_rating_vs_purchase(self, subscription_status, gender, category, shipping_type, age_group):
-        df = self.filter_data(subscription_status, gender,
-                              category, shipping_type, age_group)
-        df['rating_group'] = pd.cut(df['review_rating'], bins=[0, 2, 3, 4, 5], labels=[
-                                    '1-2', '2-3', '3-4', '4-5'])
-        fig = go.Figure()
-
-        for rating in ['1-2', '2-3', '3-4', '4-5']:
-            data = df[df['rating_group'] == rating]['purchase_amount']
-            fig.add_trace(go.Box(
-                y=data,
-                name=rating,
-                marker=dict(
-                    color=COLORS_PALETTE[['1-2', '2-3', '3-4', '4-5'].index(rating)]),
-                boxmean='sd',
-                hovertemplate='Value: $%{y:.2f}<extra></extra>'
-            ))
-
-        fig.update_layout(
-            title={
-                'text': 'Review Rating vs Purchase Amount',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            xaxis_title='Rating Group',
-            yaxis_title='Purchase Amount ($)',
-            font=dict(size=12),
-            height=500,
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['review_rating', 'purchase_amount'])
+        # Derived values live in their own buffer rather than as a new
+        # column on the filtered view.
+        rating_group = pd.cut(df['review_rating'], bins=[0, 2, 3, 4, 5], labels=[
+                              '1-2', '2-3', '3-4', '4-5'])
+
+        return figure([{
+            'type': 'box',
+            'y': df['purchase_amount'][rating_group == rating].values,
+            'name': rating,
+            'marker': {'color': COLORS_PALETTE[i]},
+            'boxmean': 'sd',
+            'hovertemplate': 'Value: $%{y:.2f}<extra></extra>'
+        } for i, rating in enumerate(['1-2', '2-3', '3-4', '4-5'])], layout(
+            'Review Rating vs Purchase Amount', 500,
+            xaxis=axis('Rating Group'),
+            yaxis=axis('Purchase Amount ($)', grid=True),
             showlegend=False
-        )
-
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
-
-        return fig
+        ))
 
+    @coalesced
     def create_age_group_metrics(self, subscription_status, gender, category, shipping_type, age_group):
-        age_metrics = self.filter_data(subscription_status, gender, category, shipping_type, age_group).groupby('age_group').agg({
+        df = self.filter_data(subscription_status, gender, category, shipping_type, age_group,
+                              ['age_group', 'purchase_amount', 'review_rating', 'previous_purchases', 'customer_id'])
+        age_metrics = df.groupby('age_group').agg({
             'purchase_amount': 'mean',
             'review_rating': 'mean',
             'previous_purchases': 'mean',
@@ -1187,66 +1062,291 @@ class Chart:
             'Avg Purchase ($)', 'Avg Rating', 'Avg Previous Purchases', 'Count']
         age_metrics = age_metrics.reindex(
             ['Young Adult', 'Adult', 'Middle-aged', 'Senior'])
-
-        # Create subplots
-        fig = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=('Avg Purchase Amount', 'Avg Rating',
-                            'Avg Previous Purchases', 'Customer Count'),
+        # Counts come from the backend, which scales them up on a sample.
+        age_metrics['Count'] = self.backend.value_counts(self.selected_rows(
+            subscription_status, gender, category, shipping_type, age_group), 'age_group').reindex(age_metrics.index)
+        intervals = {column: self.confidence_intervals(df, column, 'age_group').reindex(age_metrics.index)
+                     for column in ['purchase_amount', 'review_rating', 'previous_purchases']}
+        groups = age_metrics.index.tolist()
+
+        spec = subplot_layout(
+            2, 2,
+            ['Avg Purchase Amount', 'Avg Rating', 'Avg Previous Purchases', 'Customer Count'],
             vertical_spacing=0.25,
             horizontal_spacing=0.1
         )
+        for name in ('xaxis', 'xaxis2', 'xaxis3', 'xaxis4'):
+            spec[name]['tickangle'] = -45
+        spec.update(layout('Multi-Metric Comparison by Age Group', 700, font_size=10, showlegend=False))
+
+        return figure([
+            # Avg Purchase
+            {'type': 'bar', 'x': groups, 'y': age_metrics['Avg Purchase ($)'].values,
+             'marker': {'color': PRIMARY_COLOR}, 'name': 'Avg Purchase',
+             'error_y': self.error_bars(intervals['purchase_amount']),
+             'text': [f'${x:.2f}' for x in age_metrics['Avg Purchase ($)']],
+             'textposition': 'outside', 'xaxis': 'x', 'yaxis': 'y'},
+            # Avg Rating
+            {'type': 'bar', 'x': groups, 'y': age_metrics['Avg Rating'].values,
+             'marker': {'color': SECONDARY_COLOR}, 'name': 'Avg Rating',
+             'error_y': self.error_bars(intervals['review_rating']),
+             'text': [f'{x:.2f}⭐' for x in age_metrics['Avg Rating']],
+             'textposition': 'outside', 'xaxis': 'x2', 'yaxis': 'y2'},
+            # Avg Previous Purchases
+            {'type': 'bar', 'x': groups, 'y': age_metrics['Avg Previous Purchases'].values,
+             'marker': {'color': ACCENT_COLOR}, 'name': 'Avg Prev Purchases',
+             'error_y': self.error_bars(intervals['previous_purchases']),
+             'text': [f'{x:.1f}' for x in age_metrics['Avg Previous Purchases']],
+             'textposition': 'outside', 'xaxis': 'x3', 'yaxis': 'y3'},
+            # Customer Count
+            {'type': 'bar', 'x': groups, 'y': age_metrics['Count'].values,
+             'marker': {'color': '#6b2d73'}, 'name': 'Count',
+             'text': age_metrics['Count'].values,
+             'textposition': 'outside', 'xaxis': 'x4', 'yaxis': 'y4'},
+        ], spec)
+
+    @coalesced
+    def create_segment_distribution(self, subscription_status, gender, category, shipping_type, age_group):
+        segment_counts = self.segment_customers(self.selections(
+            subscription_status, gender, category, shipping_type, age_group))
+
+        return figure([{
+            'type': 'bar',
+            'x': segment_counts.index.tolist(),
+            'y': segment_counts.values,
+            'marker': {'color': GRADIENT_COLORS + COLORS_PALETTE[:2], 'line': BAR_OUTLINE},
+            'text': segment_counts.values,
+            'textposition': 'outside',
+            'hovertemplate': '<b>%{x}</b><br>Customers: %{y}<extra></extra>',
+            **self.estimate_error('error_y', segment_counts)
+        }], layout(
+            'Customers by RFM Segment', 450,
+            xaxis=axis('Segment', tickangle=-45),
+            yaxis=axis('Number of Customers', grid=True)
+        ))
 
-        # Avg Purchase
-        fig.add_trace(
-            go.Bar(x=age_metrics.index, y=age_metrics['Avg Purchase ($)'],
-                   marker_color=PRIMARY_COLOR, name='Avg Purchase',
-                   text=[f'${x:.2f}' for x in age_metrics['Avg Purchase ($)']],
-                   textposition='outside'),
-            row=1, col=1
-        )
+    @coalesced
+    def create_segment_revenue(self, subscription_status, gender, category, shipping_type, age_group):
+        rows = self.filter_rows(self.selections(
+            subscription_status, gender, category, shipping_type, age_group))
+        segments = self.customer_segments()[rows]
+        amounts = self.df['purchase_amount'].to_numpy(dtype=float)[rows]
+        weights = self.row_weights(rows)
+        revenue = np.bincount(segments, weights=amounts if weights is None else amounts * weights,
+                              minlength=len(SEGMENTS))
+        present = np.bincount(segments, minlength=len(SEGMENTS)) > 0
+        segment_revenue = pd.Series(revenue[present], index=np.array(SEGMENTS)[present])
+
+        return figure([{
+            'type': 'pie',
+            'labels': segment_revenue.index.tolist(),
+            'values': segment_revenue.values,
+            'hole': 0.4,
+            'marker': {'colors': GRADIENT_COLORS + COLORS_PALETTE[:2]},
+            'textinfo': 'label+percent',
+            'hovertemplate': '<b>%{label}</b><br>Revenue: $%{value:,.2f}<br>Percentage: %{percent}<extra></extra>'
+        }], layout('Revenue by RFM Segment', 450, pie=True))
+
+    @coalesced
+    def create_rfm_heatmap(self, subscription_status, gender, category, shipping_type, age_group):
+        rfm = self.rfm(self.selections(
+            subscription_status, gender, category, shipping_type, age_group))
+        grid = rfm.pivot_table(index='r_score', columns='f_score', values='monetary',
+                               aggfunc='mean').reindex(index=range(1, 6), columns=range(1, 6))
+
+        return figure([{
+            'type': 'heatmap',
+            'z': grid.values,
+            'x': [f'F{x}' for x in grid.columns],
+            'y': [f'R{y}' for y in grid.index],
+            'colorscale': HEATMAP_COLORSCALE,
+            'text': np.round(grid.values, 0),
+            'texttemplate': '$%{text}',
+            'textfont': {'size': 10},
+            'hovertemplate': '%{y} / %{x}<br>Avg Monetary: $%{z:.2f}<extra></extra>'
+        }], layout(
+            'Average Monetary Value by Recency and Frequency Score', 500,
+            xaxis=axis('Frequency Score'),
+            yaxis=axis('Recency Score')
+        ))
 
-        # Avg Rating
-        fig.add_trace(
-            go.Bar(x=age_metrics.index, y=age_metrics['Avg Rating'],
-                   marker_color=SECONDARY_COLOR, name='Avg Rating',
-                   text=[f'{x:.2f}⭐' for x in age_metrics['Avg Rating']],
-                   textposition='outside'),
-            row=1, col=2
-        )
+    @coalesced
+    def create_cluster_sizes(self, subscription_status, gender, category, shipping_type, age_group):
+        profiles = self.cluster_profiles(self.selections(
+            subscription_status, gender, category, shipping_type, age_group))
+
+        return figure([{
+            'type': 'bar',
+            'x': profiles.index.tolist(),
+            'y': profiles['customers'].values,
+            'marker': {'color': COLORS_PALETTE[:len(profiles)], 'line': BAR_OUTLINE},
+            'text': profiles['customers'].values,
+            'textposition': 'outside',
+            'customdata': profiles['purchase_amount'].values,
+            'hovertemplate': '<b>%{x}</b><br>Customers: %{y}<br>Avg Purchase: $%{customdata:.2f}<extra></extra>'
+        }], layout(
+            'Customers by Cluster', 450,
+            xaxis=axis('Cluster'),
+            yaxis=axis('Number of Customers', grid=True)
+        ))
 
-        # Avg Previous Purchases
-        fig.add_trace(
-            go.Bar(x=age_metrics.index, y=age_metrics['Avg Previous Purchases'],
-                   marker_color=ACCENT_COLOR, name='Avg Prev Purchases',
-                   text=[f'{x:.1f}' for x in age_metrics['Avg Previous Purchases']],
-                   textposition='outside'),
-            row=2, col=1
-        )
+    @coalesced
+    def create_cluster_profiles(self, subscription_status, gender, category, shipping_type, age_group):
+        profiles = self.cluster_profiles(self.selections(
+            subscription_status, gender, category, shipping_type, age_group))[self.cube.measures]
+
+        # Color by how far each cluster sits from the overall average, so
+        # columns on different scales share one color axis.
+        overall = self.df[self.cube.measures]
+        scores = (profiles - overall.mean()) / overall.std().replace(0, 1)
+
+        return figure([{
+            'type': 'heatmap',
+            'z': scores.values,
+            'x': profiles.columns.tolist(),
+            'y': profiles.index.tolist(),
+            'colorscale': HEATMAP_COLORSCALE,
+            'text': np.round(profiles.values, 1),
+            'texttemplate': '%{text}',
+            'textfont': {'size': 10},
+            'hovertemplate': '%{y}<br>%{x}: %{text}<br>Std. from average: %{z:.2f}<extra></extra>'
+        }], layout(
+            'Cluster Profiles', 450,
+            xaxis={'side': 'bottom'},
+            yaxis={'side': 'left'}
+        ))
 
-        # Customer Count
-        fig.add_trace(
-            go.Bar(x=age_metrics.index, y=age_metrics['Count'],
-                   marker_color='#6b2d73', name='Count',
-                   text=age_metrics['Count'].values,
-                   textposition='outside'),
-            row=2, col=2
-        )
+    def create_breakdown_comparison(self, selections_a, selections_b, dimension):
+        breakdown = self.compare(selections_a, selections_b)['breakdowns'][dimension]
+        breakdown = breakdown[(breakdown['count_A'] > 0) | (breakdown['count_B'] > 0)]
+        label = dimension.replace('_', ' ').title()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = {segment: breakdown[f'count_{segment}'] / breakdown[f'count_{segment}'].sum() * 100
+                      for segment in ('A', 'B')}
+        delta = shares['B'] - shares['A']
+
+        return figure([{
+            'type': 'bar',
+            'name': f'Segment {segment}',
+            'x': breakdown.index.tolist(),
+            'y': shares[segment].values,
+            'marker': {'color': color, 'line': BAR_OUTLINE},
+            'customdata': breakdown[[f'count_{segment}', f'revenue_{segment}']].values,
+            'text': [f'{share:.1f}%' for share in shares[segment]] if segment == 'A' else
+                    [f'{share:.1f}% ({change:+.1f})' for share, change in zip(shares[segment], delta)],
+            'textposition': 'outside',
+            'hovertemplate': f'<b>%{{x}}</b><br>Segment {segment}: %{{y:.1f}}% of purchases'
+                             '<br>Purchases: %{customdata[0]:,.0f}<br>Revenue: $%{customdata[1]:,.2f}<extra></extra>'
+        } for segment, color in (('A', PRIMARY_COLOR), ('B', SECONDARY_COLOR))], layout(
+            f'{label} Mix: Segment A vs B', 450,
+            xaxis=axis(label),
+            yaxis=axis('Share of Purchases (%)', grid=True),
+            barmode='group'
+        ))
 
-        fig.update_layout(
-            title={
-                'text': 'Multi-Metric Comparison by Age Group',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': 'white' if st.get_option(
-                    "theme.base") != "dark" else "#2d3748"}
-            },
-            showlegend=False,
-            height=700,
-            font=dict(size=10)
-        )
+    def create_measure_comparison(self, selections_a, selections_b):
+        means = self.compare(selections_a, selections_b)['means']
+        labels = [column.replace('_', ' ').title() for column in means.index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (means['B'] / means['A'] - 1) * 100
+
+        return figure([{
+            'type': 'bar',
+            'name': f'Segment {segment}',
+            'x': labels,
+            'y': means[segment].values,
+            'marker': {'color': color, 'line': BAR_OUTLINE},
+            'text': [f'{value:.2f}' for value in means[segment]] if segment == 'A' else
+                    [f'{value:.2f} ({delta:+.1f}%)' for value, delta in zip(means[segment], change)],
+            'textposition': 'outside',
+            'hovertemplate': f'<b>%{{x}}</b><br>Segment {segment} average: %{{y:.2f}}<extra></extra>'
+        } for segment, color in (('A', PRIMARY_COLOR), ('B', SECONDARY_COLOR))], layout(
+            'Average Customer Metrics: Segment A vs B', 450,
+            xaxis=axis('Metric'),
+            yaxis=axis('Average', grid=True),
+            barmode='group'
+        ))
 
-        # Update all xaxes
-        fig.update_xaxes(tickangle=-45)
 
-        return fig
+class SampleChart(Chart):
+    # A Chart over a stratified sample of another one, with the strata being
+    # the cells of the full data's cube. RFM scores and cluster labels are
+    # the ones computed on the full data.
+    def __init__(self, parent, rows):
+        super().__init__(parent.df.iloc[rows], version=f'{parent.version}-sample')
+        self.parent = copy.copy(parent)
+        self.parent.filter_state = None
+        self.rows = rows
+        self.strata = parent.cube.cells[rows]
+        self.fraction = len(rows) / len(parent.df) if len(parent.df) else 1.0
+        # Counts and sums are estimated for the full data, not the sample.
+        customers = parent.encoding('customer_id')[0]
+        self.customer_rows = np.bincount(customers)[customers[rows]]
+        self.backend = SampleBackend(self.df, self.strata, parent.cube.counts, {'customer_id': self.customer_rows})
+        self.weights = (parent.cube.counts / np.maximum(np.bincount(
+            self.strata, minlength=parent.cube.size), 1))[self.strata]
+
+    def row_weights(self, rows):
+        return self.weights[rows]
+
+    def top_values(self, column, k, selections, measure=None, how='sum'):
+        codes, labels = self.encodings[column]
+        groups = np.full(len(codes), -1, dtype=np.int64)
+        rows = self.filter_rows(selections)
+        groups[rows] = codes[rows]
+
+        population = self.parent.cube.counts
+        counts, count_variances = stratified_group_totals(self.strata, population, groups, len(labels))
+        if measure is None:
+            values, variances = np.rint(counts).astype(np.int64), count_variances
+        else:
+            values, variances = stratified_group_totals(
+                self.strata, population, groups, len(labels), self.df[measure].to_numpy(dtype=float))
+            if how == 'mean':
+                values, variances = values / np.maximum(counts, 1), None
+
+        present = np.bincount(groups[groups >= 0], minlength=len(labels)) > 0
+        top = top_k(values, k, valid=present)
+        estimates = pd.Series(values[top], index=labels[top], name=column)
+        if variances is not None:
+            estimates.attrs['margin'] = pd.Series(self.backend.z * np.sqrt(variances[top]), index=labels[top])
+        return estimates
+
+    def group_customers(self, selections, groups, n_groups):
+        # Distinct customers per group, each estimated from the sampled
+        # purchases in that group, and the margins of the estimates.
+        in_selection = np.zeros(len(self.rows), dtype=bool)
+        in_selection[self.filter_rows(selections)] = True
+        customers = self.encoding('customer_id')[0]
+        estimates = [estimate_distinct(self.strata, self.parent.cube.counts, customers,
+                                       in_selection & (groups == code), self.customer_rows)
+                     for code in range(n_groups)]
+        return (np.array([round(estimate) for estimate, _ in estimates]),
+                self.backend.z * np.sqrt([variance for _, variance in estimates]))
+
+    def segment_customers(self, selections):
+        counts, margins = self.group_customers(selections, self.customer_segments(), len(SEGMENTS))
+        counts = pd.Series(counts, index=SEGMENTS, name='count')
+        counts.attrs['margin'] = pd.Series(margins, index=SEGMENTS)
+        return counts
+
+    def cluster_customers(self, selections):
+        return self.group_customers(selections, self.customer_clusters(), len(CLUSTERS))[0]
+
+    def customer_rfm(self):
+        rfm, codes = self.parent.customer_rfm()
+        return rfm, codes[self.rows]
+
+    def customer_clusters(self):
+        return self.parent.customer_clusters()[self.rows]
+
+    def estimate_kpis(self, subscription_status, gender, category, shipping_type, age_group):
+        in_domain = np.zeros(len(self.rows), dtype=bool)
+        in_domain[self.filter_rows(self.selections(
+            subscription_status, gender, category, shipping_type, age_group))] = True
+        return estimate_kpis(
+            self.strata, self.parent.cube.counts,
+            self.df['purchase_amount'].to_numpy(dtype=float),
+            self.df['review_rating'].to_numpy(dtype=float),
+            self.encoding('customer_id')[0], self.customer_rows, in_domain)
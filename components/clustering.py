@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .cube import NUMERICAL_COLUMNS
+
+CLUSTER_COUNT = 4
+CLUSTERS = [f'Cluster {number}' for number in range(1, CLUSTER_COUNT + 1)]
+CATEGORICAL_COLUMNS = ['subscription_status', 'gender', 'category', 'shipping_type']
+# Customers drawn per mini-batch step, and customers per chunk in the
+# labelling pass.
+BATCH_SIZE = 4096
+CHUNK_SIZE = 65536
+# Two customers that differ in one categorical column end up one standard
+# deviation apart, the same as a one-sigma gap in a numeric column.
+ONE_HOT_SCALE = np.sqrt(0.5)
+
+
+class ClusterFeatures:
+    # Keeps the source columns as they are and only builds the standardized,
+    # one-hot encoded design matrix for the rows of one batch or chunk.
+    def __init__(self, df, numeric=NUMERICAL_COLUMNS, categorical=CATEGORICAL_COLUMNS):
+        self.numeric = [df[column].to_numpy(dtype=float) for column in numeric]
+        self.means = np.array([values.mean() if len(values) else 0.0 for values in self.numeric])
+        scales = np.array([values.std() if len(values) else 0.0 for values in self.numeric])
+        self.scales = np.where(scales > 0, scales, 1.0)
+
+        self.codes = []
+        self.offsets = []
+        self.names = list(numeric)
+        for column in categorical:
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            self.codes.append(codes)
+            self.offsets.append(len(self.names))
+            self.names += [f'{column}={level}' for level in uniques]
+
+        self.n_rows = len(df)
+        self.width = len(self.names)
+
+    def matrix(self, rows):
+        first = self.numeric[0] if self.numeric else self.codes[0]
+        size = len(first[rows])
+        out = np.zeros((size, self.width))
+        for column, values in enumerate(self.numeric):
+            out[:, column] = (values[rows] - self.means[column]) / self.scales[column]
+        for codes, offset in zip(self.codes, self.offsets):
+            out[np.arange(size), offset + codes[rows]] = ONE_HOT_SCALE
+        return out
+
+
+class MiniBatchKMeans:
+    def __init__(self, n_clusters=CLUSTER_COUNT, batch_size=BATCH_SIZE, max_steps=100,
+                 tol=1e-4, seed=0, max_workers=None):
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.max_steps = max_steps
+        self.tol = tol
+        self.seed = seed
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        self.centers = None
+        self.steps = 0
+
+    def fit(self, features):
+        rng = np.random.default_rng(self.seed)
+        self.centers = self.initial_centers(features, rng)
+        counts = np.zeros(len(self.centers))
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            for self.steps in range(1, self.max_steps + 1):
+                # Every step draws one batch and splits it over the workers;
+                # their partial sums are merged before the centers move.
+                batch = rng.integers(0, features.n_rows, self.batch_size)
+                shards = np.array_split(batch, self.max_workers)
+                partials = list(pool.map(
+                    lambda rows: self.partial_sums(features.matrix(rows)), shards))
+                sums = sum(partial[0] for partial in partials)
+                batch_counts = sum(partial[1] for partial in partials)
+
+                # Each center moves with a learning rate of one over the
+                # number of rows it has absorbed so far.
+                total = counts + batch_counts
+                hit = batch_counts > 0
+                centers = self.centers.copy()
+                centers[hit] = (self.centers[hit] * counts[hit, None] + sums[hit]) / total[hit, None]
+                shift = ((centers - self.centers) ** 2).sum()
+                self.centers, counts = centers, total
+                if shift < self.tol:
+                    break
+        return self
+
+    def initial_centers(self, features, rng):
+        # k-means++ seeding on a sample that is small enough to hold whole.
+        sample = features.matrix(rng.choice(
+            features.n_rows, min(features.n_rows, 16 * self.batch_size), replace=False))
+        centers = [sample[rng.integers(len(sample))]]
+        distances = ((sample - centers[0]) ** 2).sum(axis=1)
+        for _ in range(1, self.n_clusters):
+            if not distances.sum():
+                # Fewer distinct rows than clusters.
+                break
+            centers.append(sample[rng.choice(len(sample), p=distances / distances.sum())])
+            distances = np.minimum(distances, ((sample - centers[-1]) ** 2).sum(axis=1))
+        return np.array(centers)
+
+    def assign(self, matrix):
+        # |x - c|^2 without the |x|^2 term, which is the same for every center.
+        return np.argmin((self.centers ** 2).sum(axis=1) - 2 * matrix @ self.centers.T, axis=1)
+
+    def partial_sums(self, matrix):
+        members = np.eye(len(self.centers))[self.assign(matrix)]
+        return members.T @ matrix, members.sum(axis=0)
+
+    def predict(self, features, chunk_size=CHUNK_SIZE):
+        labels = np.empty(features.n_rows, dtype=np.int8)
+
+        def label(start):
+            stop = min(start + chunk_size, features.n_rows)
+            labels[start:stop] = self.assign(features.matrix(slice(start, stop)))
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            list(pool.map(label, range(0, features.n_rows, chunk_size)))
+        return labels
+
+
+def customer_features(df, codes, n_customers):
+    # One row per customer: numeric columns averaged over the customer's
+    # purchases, categorical columns at their most frequent level.
+    purchases = np.bincount(codes, minlength=n_customers)
+    columns = {}
+    for column in NUMERICAL_COLUMNS:
+        columns[column] = np.bincount(
+            codes, weights=df[column].to_numpy(dtype=float), minlength=n_customers) / purchases
+    for column in CATEGORICAL_COLUMNS:
+        levels, uniques = pd.factorize(df[column], use_na_sentinel=False)
+        tally = np.bincount(codes * len(uniques) + levels,
+                            minlength=n_customers * len(uniques)).reshape(n_customers, len(uniques))
+        columns[column] = uniques.take(tally.argmax(axis=1))
+    return pd.DataFrame(columns)
+
+
+def cluster_customers(df, n_clusters=CLUSTER_COUNT, max_workers=None):
+    # Customers are clustered, not purchases, and every row gets the cluster
+    # of its customer.
+    if len(df) == 0:
+        return np.empty(0, dtype=np.int8)
+
+    codes, customers = pd.factorize(df['customer_id'], use_na_sentinel=False)
+    features = ClusterFeatures(customer_features(df, codes, len(customers)))
+    labels = MiniBatchKMeans(n_clusters, max_workers=max_workers).fit(features).predict(features)
+
+    # Number clusters from most to fewest customers so the names stay put
+    # when the same data is clustered again.
+    order = np.argsort(-np.bincount(labels, minlength=n_clusters), kind='stable')
+    rank = np.empty(n_clusters, dtype=np.int8)
+    rank[order] = np.arange(n_clusters)
+    return rank[labels][codes]
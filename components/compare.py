@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+SEGMENT_NAMES = ['A', 'B']
+COMPARE_DIMENSIONS = ['category', 'season', 'age_group', 'shipping_type', 'payment_method', 'size']
+# Row tags are 1 (only A), 2 (only B) or 3 (both), so overlapping segments
+# need no second pass. This maps each tag to the segments it belongs to.
+MEMBERSHIP = np.array([[0, 0], [1, 0], [0, 1], [1, 1]])
+
+
+def segment_tags(n_rows, rows_a, rows_b):
+    tags = np.zeros(n_rows, dtype=np.int8)
+    tags[rows_a] |= 1
+    tags[rows_b] |= 2
+    return tags
+
+
+def merge_selections(base, extra):
+    # A segment narrows the sidebar filters; a dimension chosen in both
+    # keeps only the values they share.
+    merged = dict(base)
+    for dimension, selected in extra.items():
+        if not selected:
+            continue
+        current = merged.get(dimension)
+        merged[dimension] = list(selected) if current is None else \
+            [value for value in selected if value in set(current)]
+    return merged
+
+
+def compare_segments(tags, measures, amounts, ratings, customers, encodings):
+    # Every statistic is one bincount over (group, tag) pairs of the tagged
+    # rows, folded into per-segment columns with MEMBERSHIP.
+    rows = np.flatnonzero(tags)
+    tagged = tags[rows]
+
+    counts = np.bincount(tagged, minlength=4) @ MEMBERSHIP
+    revenue = np.bincount(tagged, weights=amounts[rows], minlength=4) @ MEMBERSHIP
+    rating_sums = np.bincount(tagged, weights=ratings[rows], minlength=4) @ MEMBERSHIP
+
+    # Distinct customers per segment from the distinct (customer, tag) pairs.
+    pairs = np.unique(customers[rows].astype(np.int64) * 4 + tagged)
+    customer_count = [len(np.unique(pairs[(pairs % 4 & bit) > 0] // 4)) for bit in (1, 2)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kpis = pd.DataFrame({
+            'total_revenue': revenue,
+            'average_order_value': revenue / counts,
+            'total_customers': customer_count,
+            'average_rating': rating_sums / counts,
+        }, index=SEGMENT_NAMES).T
+
+        means = pd.DataFrame({
+            name: (np.bincount(tagged, weights=values[rows], minlength=4) @ MEMBERSHIP) / counts
+            for name, values in measures.items()
+        }, index=SEGMENT_NAMES).T
+
+    breakdowns = {}
+    for dimension, (codes, labels) in encodings.items():
+        keys = codes[rows].astype(np.int64) * 4 + tagged
+        size = len(labels) * 4
+        grouped = {
+            'count': np.bincount(keys, minlength=size).reshape(-1, 4) @ MEMBERSHIP,
+            'revenue': np.bincount(keys, weights=amounts[rows], minlength=size).reshape(-1, 4) @ MEMBERSHIP,
+        }
+        breakdowns[dimension] = pd.DataFrame({
+            f'{statistic}_{segment}': values[:, column]
+            for statistic, values in grouped.items()
+            for column, segment in enumerate(SEGMENT_NAMES)
+        }, index=pd.Index(labels, name=dimension))
+
+    return {'counts': counts, 'kpis': kpis, 'means': means, 'breakdowns': breakdowns}
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+FILTER_DIMENSIONS = ['subscription_status', 'gender',
+                     'category', 'shipping_type', 'age_group']
+NUMERICAL_COLUMNS = ['age', 'purchase_amount', 'review_rating',
+                     'previous_purchases', 'purchase_frequency_days']
+
+
+class Cube:
+    def __init__(self, df, dimensions=FILTER_DIMENSIONS, measures=NUMERICAL_COLUMNS):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+
+        self.levels = {}
+        self.positions = {}
+        self.codes = {}
+        for dimension in self.dimensions:
+            codes, uniques = pd.factorize(
+                df[dimension], use_na_sentinel=False)
+            self.levels[dimension] = uniques.tolist()
+            self.positions[dimension] = {
+                level: code for code, level in enumerate(self.levels[dimension])}
+            self.codes[dimension] = codes
+
+        self.shape = tuple(len(self.levels[d]) for d in self.dimensions)
+        self.size = int(np.prod(self.shape))
+        self.cells = np.ravel_multi_index(
+            [self.codes[d] for d in self.dimensions], self.shape) if len(df) else np.empty(0, dtype=np.intp)
+        self.counts = np.bincount(self.cells, minlength=self.size)
+
+        # Moments are accumulated around the global mean so that the
+        # sum-of-squares formula stays numerically stable.
+        values = df[self.measures].to_numpy(dtype=float)
+        self.center = values.mean(axis=0) if len(df) else np.zeros(len(self.measures))
+        centered = values - self.center
+
+        m = len(self.measures)
+        self.sums = np.empty((self.size, m))
+        self.cross = np.empty((self.size, m, m))
+        for i in range(m):
+            self.sums[:, i] = np.bincount(
+                self.cells, weights=centered[:, i], minlength=self.size)
+            for j in range(i, m):
+                self.cross[:, i, j] = np.bincount(
+                    self.cells, weights=centered[:, i] * centered[:, j], minlength=self.size)
+                self.cross[:, j, i] = self.cross[:, i, j]
+
+    def level_mask(self, dimension, selected):
+        mask = np.zeros(len(self.levels[dimension]), dtype=bool)
+        values = selected if isinstance(
+            selected, (list, tuple, set, frozenset)) else [selected]
+        for value in values:
+            code = self.positions[dimension].get(value)
+            if code is not None:
+                mask[code] = True
+        return mask
+
+    def cell_mask(self, selections):
+        mask = np.ones(self.shape, dtype=bool)
+        for axis, dimension in enumerate(self.dimensions):
+            selected = selections.get(dimension)
+            if selected is None:
+                continue
+            shape = [1] * len(self.shape)
+            shape[axis] = -1
+            mask &= self.level_mask(dimension, selected).reshape(shape)
+        return mask.ravel()
+
+    def totals(self, measure):
+        i = self.measures.index(measure)
+        return self.sums[:, i] + self.counts * self.center[i]
+
+    def facet(self, dimension, selections, measure=None, values=None):
+        # Each dimension is faceted against the selections on the others,
+        # so picking a category does not hide the remaining categories.
+        others = {d: v for d, v in selections.items() if d != dimension}
+        if values is None:
+            values = self.counts if measure is None else self.totals(measure)
+        grid = np.where(self.cell_mask(others), values, 0).reshape(self.shape)
+
+        axis = self.dimensions.index(dimension)
+        totals = grid.sum(axis=tuple(a for a in range(len(self.shape)) if a != axis))
+        return dict(zip(self.levels[dimension], totals.tolist()))
+
+    def moments(self, selections):
+        cells = self.cell_mask(selections)
+        return self.counts[cells].sum(), self.sums[cells].sum(axis=0), self.cross[cells].sum(axis=0)
+
+    def correlation(self, selections):
+        n, sums, cross = self.moments(selections)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = cross - np.outer(sums, sums) / n
+            # Constant columns leave only rounding noise behind.
+            variance = np.diag(cov)
+            std = np.where(variance > 1e-9 * np.diag(cross),
+                           np.sqrt(np.abs(variance)), 0.0)
+            scale = np.outer(std, std)
+            corr = np.where(scale > 0, np.clip(cov / scale, -1.0, 1.0), np.nan)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+
+        return pd.DataFrame(corr, index=self.measures, columns=self.measures)
@@ -0,0 +1,143 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+PARTITION_SUFFIXES = ('.csv', '.parquet')
+
+
+def read_partition(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def freeze(df):
+    # Numpy-backed columns are handed over as read-only arrays, one per
+    # column; extension columns such as Arrow strings are immutable already.
+    columns = {}
+    for name, series in df.items():
+        if isinstance(series.dtype, np.dtype):
+            values = series.to_numpy()
+            values.flags.writeable = False
+            columns[name] = values
+        else:
+            columns[name] = series.array
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def source_signature(csv_file, partitions=None):
+    if isinstance(csv_file, (str, os.PathLike)) and os.path.isdir(csv_file):
+        csv_file = PartitionedDataset(csv_file)
+
+    if isinstance(csv_file, PartitionedDataset):
+        signature = []
+        for path, _ in csv_file.prune(partitions):
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    stat = os.stat(csv_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class PartitionedDataset:
+    def __init__(self, path, max_workers=None):
+        self.path = path
+        self.max_workers = max_workers
+        # path -> (stat signature, frame, bytes held)
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_workers': self.max_workers}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_workers'])
+
+    def __eq__(self, other):
+        return isinstance(other, PartitionedDataset) and self.path == other.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def memory_usage(self):
+        with self.lock:
+            return sum(nbytes for _, _, nbytes in self.frames.values())
+
+    def discover(self):
+        partitions = []
+        for root, dirs, files in os.walk(self.path):
+            dirs.sort()
+            relative = os.path.relpath(root, self.path)
+            keys = {}
+            for segment in ([] if relative == os.curdir else relative.split(os.sep)):
+                if '=' in segment:
+                    key, value = segment.split('=', 1)
+                    keys[key] = value
+
+            for name in sorted(files):
+                if name.endswith(PARTITION_SUFFIXES):
+                    partitions.append((os.path.join(root, name), keys))
+        return partitions
+
+    def partition_values(self):
+        values = {}
+        for _, keys in self.discover():
+            for key, value in keys.items():
+                values.setdefault(key, [])
+                if value not in values[key]:
+                    values[key].append(value)
+        return values
+
+    def prune(self, partitions=None):
+        selected = []
+        for path, keys in self.discover():
+            if all(key not in keys or keys[key] in allowed
+                   for key, allowed in (partitions or {}).items()):
+                selected.append((path, keys))
+        return selected
+
+    def load(self, partitions=None):
+        selected = self.prune(partitions)
+
+        # Files are keyed by their stat signature, so a new or rewritten
+        # partition is read on its own and the others come from memory.
+        signatures = {}
+        for path, _ in selected:
+            stat = os.stat(path)
+            signatures[path] = (stat.st_mtime_ns, stat.st_size)
+
+        # References are taken up front, so a concurrent load that prunes
+        # the cache cannot pull a frame out from under this one.
+        with self.lock:
+            frames = {path: self.frames[path][1] for path in signatures
+                      if self.frames.get(path, (None,))[0] == signatures[path]}
+        stale = [path for path in signatures if path not in frames]
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                frames.update(zip(stale, pool.map(read_partition, stale)))
+
+        # Only the partitions of the latest load are kept; deleted and
+        # pruned ones are read again if a later load needs them.
+        sizes = {path: int(frames[path].memory_usage(deep=True).sum()) for path in stale}
+        with self.lock:
+            for path in stale:
+                self.frames[path] = (signatures[path], frames[path], sizes[path])
+            for path in [path for path in self.frames if path not in signatures]:
+                del self.frames[path]
+
+        parts = []
+        for path, keys in selected:
+            frame = frames[path]
+            missing = {key: value for key, value in keys.items()
+                       if key not in frame.columns}
+            parts.append(frame.assign(**missing) if missing else frame)
+
+        if not parts:
+            raise FileNotFoundError(
+                f'No partitions under {self.path} match {partitions}')
+        return pd.concat(parts, ignore_index=True)
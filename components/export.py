@@ -0,0 +1,105 @@
+import os
+import tempfile
+
+# Rows gathered and encoded at a time; memory use is bounded by one chunk
+# no matter how many rows the filters select.
+EXPORT_CHUNK_ROWS = 50_000
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ChunkSink:
+    # Minimal writable file for pyarrow that hands written bytes back out
+    # after every row group instead of keeping the whole file.
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def row_chunks(chart, selections, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Rows come from the filter index, and only one chunk of them is
+    # gathered from the base frame at a time.
+    rows = chart.filter_rows(selections)
+    if len(rows) == 0:
+        yield chart.df.iloc[:0]
+    for start in range(0, len(rows), chunk_rows):
+        yield chart.df.iloc[rows[start:start + chunk_rows]]
+
+
+def csv_chunks(chart, selections, chunk_rows=EXPORT_CHUNK_ROWS):
+    for index, chunk in enumerate(row_chunks(chart, selections, chunk_rows)):
+        yield chunk.to_csv(index=False, header=index == 0).encode()
+
+
+def parquet_chunks(chart, selections, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = ChunkSink()
+    writer = None
+    for chunk in row_chunks(chart, selections, chunk_rows):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), table.schema)
+        # Every chunk becomes one row group, written out as it is encoded.
+        writer.write_table(table.cast(writer.schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(chart, selections, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown export format: {fmt}')
+    if fmt == 'parquet':
+        return parquet_chunks(chart, selections, chunk_rows)
+    return csv_chunks(chart, selections, chunk_rows)
+
+
+def export_to_path(chart, selections, path, fmt=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, 'wb') as out:
+        for data in export_chunks(chart, selections, fmt, chunk_rows):
+            out.write(data)
+    return path
+
+
+def export_file(chart, selections, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    # A file opened for reading, which st.download_button accepts. The
+    # chunks are written to disk as they are encoded, so memory stays at
+    # one chunk until Streamlit reads the result. The name is unlinked
+    # right away; the open handle keeps the data readable.
+    with tempfile.NamedTemporaryFile(suffix=f'.{fmt}', delete=False) as out:
+        try:
+            for data in export_chunks(chart, selections, fmt, chunk_rows):
+                out.write(data)
+        except BaseException:
+            os.unlink(out.name)
+            raise
+    try:
+        return open(out.name, 'rb')
+    finally:
+        os.unlink(out.name)
@@ -0,0 +1,211 @@
+import copy
+from functools import lru_cache
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
+# Shared pieces of every chart layout. Specs are assembled as plain dicts
+# and wrapped without validation, so none of this goes through the
+# per-property validators of go.Figure / update_layout.
+GRID = {'showgrid': True, 'gridwidth': 1, 'gridcolor': '#f0f0f0'}
+BAR_OUTLINE = {'color': 'white', 'width': 1}
+HEATMAP_COLORSCALE = [[0, '#f0e6f5'], [0.5, '#7b3785'], [1, '#4a1f52']]
+PIE_LEGEND = {'orientation': 'h', 'x': 0.5, 'xanchor': 'center', 'y': 1.20, 'yanchor': 'top'}
+# px places every trace on one full-size subplot.
+PX_AXIS = {'anchor': 'y', 'domain': [0.0, 1.0]}
+PX_YAXIS = {'anchor': 'x', 'domain': [0.0, 1.0]}
+
+
+def title_color():
+    return 'white' if st.get_option("theme.base") != "dark" else "#2d3748"
+
+
+def layout(title, height, xaxis=None, yaxis=None, font_size=12, pie=False, **extra):
+    spec = {
+        'title': {'text': title, 'x': 0.5, 'xanchor': 'center',
+                  'font': {'size': 24, 'color': title_color()}},
+        'font': {'size': font_size},
+        'height': height,
+    }
+    if pie:
+        spec['title'].update(y=0.95, yanchor='top')
+        spec['legend'] = dict(PIE_LEGEND)
+        spec['margin'] = {'t': 125}
+    if xaxis is not None:
+        spec['xaxis'] = xaxis
+    if yaxis is not None:
+        spec['yaxis'] = yaxis
+    spec.update(extra)
+    return spec
+
+
+def axis(title=None, grid=False, **extra):
+    spec = {'title': {'text': title}} if title is not None else {}
+    if grid:
+        spec.update(GRID)
+    spec.update(extra)
+    return spec
+
+
+def figure(data, layout):
+    return go.Figure({'data': data, 'layout': layout}, _validate=False)
+
+
+def vline(x, text, position, dash, color, width=None):
+    # Same shape and annotation that Figure.add_vline produces.
+    line = {'color': color, 'dash': dash}
+    if width is not None:
+        line['width'] = width
+    top = position.startswith('top')
+    return (
+        {'type': 'line', 'x0': x, 'x1': x, 'xref': 'x', 'y0': 0, 'y1': 1, 'yref': 'y domain', 'line': line},
+        {'showarrow': False, 'text': text, 'x': x, 'xanchor': 'left', 'xref': 'x',
+         'y': 1 if top else 0, 'yanchor': 'top' if top else 'bottom', 'yref': 'y domain'},
+    )
+
+
+def hline(y, text, dash, color):
+    # Same shape and annotation that Figure.add_hline produces with the
+    # annotation on the right.
+    return (
+        {'type': 'line', 'x0': 0, 'x1': 1, 'xref': 'x domain', 'y0': y, 'y1': y, 'yref': 'y',
+         'line': {'color': color, 'dash': dash}},
+        {'showarrow': False, 'text': text, 'x': 1, 'xanchor': 'left', 'xref': 'x domain',
+         'y': y, 'yanchor': 'middle', 'yref': 'y'},
+    )
+
+
+@lru_cache(maxsize=None)
+def _subplot_layout(rows, cols, titles, vertical_spacing, horizontal_spacing):
+    from plotly.subplots import make_subplots
+
+    return make_subplots(
+        rows=rows, cols=cols, subplot_titles=titles,
+        vertical_spacing=vertical_spacing, horizontal_spacing=horizontal_spacing
+    ).to_dict()['layout']
+
+
+def subplot_layout(rows, cols, titles, vertical_spacing, horizontal_spacing):
+    # make_subplots is slow, so the grid is computed once per shape.
+    spec = copy.deepcopy(_subplot_layout(rows, cols, tuple(titles), vertical_spacing, horizontal_spacing))
+    spec.pop('template', None)
+    return spec
+
+
+def groups(values):
+    # Group levels in order of first appearance, as plotly express does.
+    return list(dict.fromkeys(values))
+
+
+def color_bars(df, x, y, color, barmode, colors=None, color_map=None, category_orders=None):
+    # The traces px.bar(df, x, y, color=color) builds for one row per bar.
+    grouped = barmode == 'group'
+    data = []
+    for index, level in enumerate(groups(df[color])):
+        rows = df[df[color] == level]
+        trace = {
+            'type': 'bar',
+            'hovertemplate': f'{color}={level}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>',
+            'legendgroup': level,
+            'marker': {'color': color_map[level] if color_map else colors[index % len(colors)],
+                       'pattern': {'shape': ''}},
+            'name': level,
+            'orientation': 'v',
+            'showlegend': True,
+            'textposition': 'auto',
+            'x': rows[x].to_numpy(),
+            'xaxis': 'x',
+            'y': rows[y].to_numpy(),
+            'yaxis': 'y',
+        }
+        if grouped:
+            trace.update(alignmentgroup='True', offsetgroup=level)
+        data.append(trace)
+
+    xaxis = dict(PX_AXIS)
+    if category_orders and x in category_orders:
+        xaxis.update(categoryorder='array', categoryarray=category_orders[x])
+    return data, xaxis
+
+
+def trendline_scatter(df, x, y, color, color_map, opacity, trendline=True):
+    # The traces px.scatter(..., color=color, trendline='ols') builds, with
+    # the least-squares fit done in numpy instead of statsmodels. Like px,
+    # large frames switch to WebGL.
+    webgl = len(df) > 1000
+    data = []
+    for level in groups(df[color]):
+        rows = df[df[color] == level]
+        xs = rows[x].to_numpy()
+        ys = rows[y].to_numpy()
+        markers = {
+            'type': 'scattergl' if webgl else 'scatter',
+            'hovertemplate': f'{color}={level}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>',
+            'legendgroup': level,
+            'marker': {'color': color_map[level], 'opacity': opacity, 'symbol': 'circle'},
+            'mode': 'markers',
+            'name': level,
+            'showlegend': True,
+            'x': xs,
+            'xaxis': 'x',
+            'y': ys,
+            'yaxis': 'y',
+        }
+        if not webgl:
+            markers['orientation'] = 'v'
+        data.append(markers)
+        if not trendline:
+            continue
+
+        valid = ~(np.isnan(xs.astype(float)) | np.isnan(ys.astype(float)))
+        xs, ys = xs[valid], ys[valid].astype(float)
+        if len(xs) < 2 or np.ptp(xs) == 0:
+            continue
+        slope, intercept = np.polyfit(xs.astype(float), ys, 1)
+        fitted = slope * xs + intercept
+        rsquared = 1 - ((ys - fitted) ** 2).sum() / ((ys - ys.mean()) ** 2).sum()
+        order = np.argsort(xs, kind='stable')
+        data.append({
+            'type': 'scattergl' if webgl else 'scatter',
+            'hovertemplate': (
+                f'<b>OLS trendline</b><br>{y} = {slope:g} * {x} + {intercept:g}<br>'
+                f'R<sup>2</sup>={rsquared:f}<br><br>'
+                f'{color}={level}<br>{x}=%{{x}}<br>{y}=%{{y}} <b>(trend)</b><extra></extra>'),
+            'legendgroup': level,
+            'marker': {'color': color_map[level], 'symbol': 'circle'},
+            'mode': 'lines',
+            'name': level,
+            'showlegend': False,
+            'x': xs[order],
+            'xaxis': 'x',
+            'y': fitted[order],
+            'yaxis': 'y',
+        })
+    return data
+
+
+def treemap(df, parent, child, value):
+    # The trace px.treemap(df, path=[parent, child], values=value,
+    # color=value) builds: leaves first, then each parent coloured by the
+    # value-weighted mean of its children.
+    values = df[value].to_numpy(dtype=float)
+    parents = df[parent].to_numpy()
+    totals = df.groupby(parent, sort=True)[value].agg(
+        total='sum', weighted=lambda counts: (counts ** 2).sum())
+    colors = np.concatenate([values, (totals['weighted'] / totals['total']).to_numpy(dtype=float)])
+
+    return {
+        'type': 'treemap',
+        'branchvalues': 'total',
+        'customdata': colors.reshape(-1, 1),
+        'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+        'hovertemplate': f'labels=%{{label}}<br>{value}_sum=%{{value}}<br>parent=%{{parent}}<br>'
+                         f'id=%{{id}}<br>{value}=%{{color}}<extra></extra>',
+        'ids': [f'{p}/{c}' for p, c in zip(parents, df[child])] + list(totals.index),
+        'labels': list(df[child]) + list(totals.index),
+        'marker': {'coloraxis': 'coloraxis', 'colors': colors},
+        'name': '',
+        'parents': list(parents) + [''] * len(totals),
+        'values': np.concatenate([values, totals['total'].to_numpy(dtype=float)]),
+    }
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def selection_key(selections, dimensions):
+    key = []
+    for dimension in dimensions:
+        selected = selections.get(dimension)
+        if selected is None:
+            key.append(None)
+        elif isinstance(selected, (list, tuple, set, frozenset)):
+            key.append(frozenset(selected))
+        else:
+            key.append(frozenset([selected]))
+    return tuple(key)
+
+
+def is_refinement(child, parent):
+    return all(p is None or (c is not None and c <= p) for c, p in zip(child, parent))
+
+
+class FilterState:
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.costs = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.refinements = 0
+        self.full_scans = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def rows(self, chart, selections):
+        key = selection_key(selections, chart.cube.dimensions)
+
+        with self.lock:
+            if self.version != chart.version:
+                self.entries.clear()
+                self.costs.clear()
+                self.version = chart.version
+
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += self.costs[key]
+                return self.entries[key]
+
+            # Narrowing a filter only ever removes rows, so the smallest
+            # cached selection that contains the new one is a valid
+            # starting point. Widening falls back to a broader ancestor.
+            parent = None
+            for cached_key, cached_rows in self.entries.items():
+                if is_refinement(key, cached_key) and (parent is None or len(cached_rows) < len(parent)):
+                    parent = cached_rows
+
+        start = time.perf_counter()
+        lookup = chart.cube.cell_mask(selections)
+        if parent is None:
+            rows = np.flatnonzero(lookup[chart.cube.cells])
+        else:
+            rows = parent[lookup[chart.cube.cells[parent]]]
+        rows.setflags(write=False)
+
+        with self.lock:
+            if parent is None:
+                self.full_scans += 1
+            else:
+                self.refinements += 1
+            self.entries[key] = rows
+            self.costs[key] = time.perf_counter() - start
+            self.evict()
+
+        return rows
+
+    def evict(self):
+        while len(self.entries) > self.capacity:
+            key, _ = self.entries.popitem(last=False)
+            del self.costs[key]
+            self.evictions += 1
+
+    def resize(self, capacity):
+        with self.lock:
+            self.capacity = capacity
+            self.evict()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.refinements + self.full_scans,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': sum(rows.nbytes for rows in self.entries.values()),
+                'saved_seconds': self.saved_seconds,
+                'capacity': self.capacity,
+                'max_bytes': None,
+            }
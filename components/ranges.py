@@ -0,0 +1,27 @@
+import numpy as np
+
+RANGE_COLUMNS = ['age', 'purchase_amount', 'review_rating', 'previous_purchases']
+
+
+class SortedIndex:
+    # Row ids ordered by one column's values, so the rows in any value range
+    # are one contiguous slice of it, found by two binary searches.
+    def __init__(self, values):
+        self.order = np.argsort(values, kind='stable')
+        self.values = values[self.order]
+
+    def bounds(self):
+        if len(self.values) == 0:
+            return 0, 0
+        return self.values[0].item(), self.values[-1].item()
+
+    def span(self, low, high):
+        return (int(np.searchsorted(self.values, low, side='left')),
+                int(np.searchsorted(self.values, high, side='right')))
+
+    def rows(self, low, high):
+        start, stop = self.span(low, high)
+        return self.order[start:stop]
+
+    def memory_usage(self):
+        return self.order.nbytes + self.values.nbytes
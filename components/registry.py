@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .backends import DEFAULT_BACKEND, make_backend
+from .chart import Chart, dataset_version
+from .dataset import source_signature
+from .snapshot import load_snapshot, remove_snapshot, save_snapshot, snapshot_path
+from .watcher import DatasetWatcher
+
+
+class DatasetRegistry:
+    def __init__(self, memory_budget=1024 * 2**20, snapshot_dir=None, backend=DEFAULT_BACKEND):
+        self.memory_budget = memory_budget
+        self.snapshot_dir = snapshot_dir
+        self.backend = backend
+        self.charts = OrderedDict()
+        self.tenants = {}
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.watcher = None
+        self.cache_budgets = {}
+
+    def get(self, tenant, csv_file, partitions=None):
+        with self.lock:
+            info = self.tenants.get(tenant)
+            if tenant in self.charts and info['source'] == (csv_file, partitions):
+                self.charts.move_to_end(tenant)
+                info['hits'] += 1
+                info['last_access'] = time.time()
+                # The caches of resident datasets grow between loads, so
+                # the budget is checked again on every lookup.
+                self.enforce_budget()
+                return self.charts[tenant]
+            loading = self.loading.setdefault(tenant, threading.Lock())
+
+        # Loading happens outside the registry lock so one cold tenant
+        # does not stall requests for the warm ones.
+        with loading:
+            with self.lock:
+                if tenant in self.charts and self.tenants[tenant]['source'] == (csv_file, partitions):
+                    return self.charts[tenant]
+
+            chart, built = self.build(csv_file, partitions)
+
+            with self.lock:
+                self.charts[tenant] = chart
+                self.charts.move_to_end(tenant)
+                self.tenants[tenant] = {
+                    **built,
+                    'loads': (info or {}).get('loads', 0) + 1,
+                    'reloads': (info or {}).get('reloads', 0),
+                    'hits': (info or {}).get('hits', 0),
+                    'evictions': (info or {}).get('evictions', 0),
+                    'last_access': time.time(),
+                }
+                self.enforce_budget()
+            return chart
+
+    def refresh(self, tenant):
+        with self.lock:
+            if tenant not in self.charts:
+                return False
+            source = self.tenants[tenant]['source']
+            loading = self.loading[tenant]
+
+        with loading:
+            chart, built = self.build(*source)
+
+            # Requests that already hold the previous chart keep using it;
+            # only lookups made after this assignment see the new one.
+            with self.lock:
+                if tenant not in self.charts or self.tenants[tenant]['source'] != source:
+                    return False
+                previous = self.charts[tenant]
+                self.charts[tenant] = chart
+                self.tenants[tenant].update(built)
+                self.tenants[tenant]['reloads'] += 1
+                self.enforce_budget()
+                in_use = any(c.version == previous.version for c in self.charts.values())
+
+            if self.snapshot_dir is not None and not in_use:
+                remove_snapshot(self.snapshot_dir, previous.version)
+        return True
+
+    def build(self, csv_file, partitions):
+        # The signature is taken before reading so that a write landing
+        # mid-load is still seen as a change on the next poll.
+        signature = source_signature(csv_file, partitions)
+        start = time.perf_counter()
+        chart, loaded_from = self.load(csv_file, partitions)
+        self.apply_budgets(chart)
+        return chart, {
+            'source': (csv_file, partitions),
+            'signature': signature,
+            'version': chart.version,
+            'data_bytes': chart.memory_usage(),
+            'load_seconds': time.perf_counter() - start,
+            'loaded_from': loaded_from,
+        }
+
+    def load(self, csv_file, partitions):
+        version = dataset_version(csv_file, partitions)
+        if self.snapshot_dir is not None:
+            chart = load_snapshot(self.snapshot_dir, version)
+            if chart is not None:
+                # Snapshots do not depend on the backend they were saved with.
+                if chart.backend.name != self.backend:
+                    chart.backend = make_backend(self.backend, chart.df)
+                return chart, 'snapshot'
+
+        chart = Chart(csv_file, partitions, version, self.backend)
+        self.save(chart)
+        return chart, 'source'
+
+    def save(self, chart):
+        if self.snapshot_dir is None or os.path.isdir(snapshot_path(self.snapshot_dir, chart.version)):
+            return
+        try:
+            save_snapshot(chart, self.snapshot_dir)
+        except OSError:
+            # A read-only deploy only loses the warm start, not the data.
+            pass
+
+    def watch(self, interval=5.0):
+        if self.watcher is None:
+            self.watcher = DatasetWatcher(self, interval)
+            self.watcher.start()
+        return self.watcher
+
+    def watched(self):
+        with self.lock:
+            return [(tenant, *self.tenants[tenant]['source'], self.tenants[tenant]['signature'])
+                    for tenant in self.charts]
+
+    def enforce_budget(self):
+        # The most recently used tenant is always kept, even when it alone
+        # exceeds the budget.
+        while len(self.charts) > 1 and self.footprint() > self.memory_budget:
+            self.retire(*self.charts.popitem(last=False))
+
+    def retire(self, tenant, chart):
+        self.tenants[tenant]['evictions'] += 1
+        self.save(chart)
+
+    def evict(self, tenant):
+        with self.lock:
+            if tenant in self.charts:
+                self.retire(tenant, self.charts.pop(tenant))
+
+    def configure_caches(self, memory_budget=None, aggregate_entries=None, figure_entries=None,
+                         figure_bytes=None):
+        # Budgets apply to the resident datasets now and to later loads.
+        with self.lock:
+            if memory_budget is not None:
+                self.memory_budget = memory_budget
+            for name, value in (('aggregate_entries', aggregate_entries), ('figure_entries', figure_entries),
+                                ('figure_bytes', figure_bytes)):
+                if value is not None:
+                    self.cache_budgets[name] = value
+            for chart in self.charts.values():
+                self.apply_budgets(chart)
+            self.enforce_budget()
+
+    def apply_budgets(self, chart):
+        budgets = self.cache_budgets
+        chart.aggregate_cache.resize(budgets.get('aggregate_entries'))
+        chart.figure_cache.resize(budgets.get('figure_entries'), budgets.get('figure_bytes'))
+
+    def footprint(self, tenant=None):
+        # The frame and derived structures are measured once at load; the
+        # aggregate and figure caches are read live. The partition frames
+        # kept by a partitioned source are shared by its tenants, so they
+        # count towards the total only.
+        tenants = self.charts if tenant is None else [tenant]
+        total = sum(self.tenants[name]['data_bytes'] + self.charts[name].cache_bytes() for name in tenants)
+        return total if tenant is not None else total + self.partition_bytes()
+
+    def partition_bytes(self):
+        datasets = {id(chart.dataset): chart.dataset for chart in self.charts.values() if chart.dataset is not None}
+        return sum(dataset.memory_usage() for dataset in datasets.values())
+
+    def stats(self):
+        with self.lock:
+            return [
+                {'tenant': tenant, 'resident': tenant in self.charts,
+                 **{key: value for key, value in info.items() if key not in ('source', 'signature')},
+                 'footprint_bytes': self.footprint(tenant) if tenant in self.charts else 0,
+                 **(self.charts[tenant].coalescing_stats() if tenant in self.charts else {})}
+                for tenant, info in self.tenants.items()
+            ]
+
+    def cache_metrics(self, filter_state=None):
+        # One row per cache: the dataset cache itself, the aggregate and
+        # figure caches of every resident dataset, and optionally one
+        # session's filter cache. Everything is read in one pass under the
+        # lock, so the dataset row's bytes are its data and partition frames
+        # plus exactly the cache bytes reported in the rows below it.
+        with self.lock:
+            tenants = list(self.tenants.items())
+            caches = [{'cache': cache, 'tenant': tenant, **stats}
+                      for tenant, chart in self.charts.items() for cache, stats in chart.cache_stats().items()]
+            data_bytes = sum(self.tenants[tenant]['data_bytes'] for tenant in self.charts)
+            metrics = [{
+                'cache': 'dataset', 'tenant': None,
+                'hits': sum(info['hits'] for _, info in tenants),
+                'misses': sum(info['loads'] for _, info in tenants),
+                'evictions': sum(info['evictions'] for _, info in tenants),
+                'entries': len(self.charts),
+                'bytes': data_bytes + self.partition_bytes() + sum(row['bytes'] for row in caches),
+                'saved_seconds': sum(info['hits'] * info['load_seconds'] for _, info in tenants),
+                'capacity': None,
+                'max_bytes': self.memory_budget,
+            }, *caches]
+
+        if filter_state is not None:
+            metrics.append({'cache': 'filter', 'tenant': None, **filter_state.stats()})
+        return metrics
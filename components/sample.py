@@ -0,0 +1,179 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Rows kept in the stratified sample, whatever the size of the data. Every
+# non-empty stratum keeps at least one row, so the sample can exceed this
+# by up to the number of strata.
+SAMPLE_ROWS = 20_000
+
+
+def stratified_sample(strata, size=SAMPLE_ROWS, seed=0):
+    # Proportional allocation: every stratum keeps the same fraction of its
+    # rows, rounded up. Rows are ranked within their stratum by a random
+    # key and the first ones are kept.
+    n_rows = len(strata)
+    if n_rows <= size:
+        return np.arange(n_rows)
+
+    counts = np.bincount(strata)
+    keep = np.ceil(counts * (size / n_rows)).astype(np.int64)
+
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(n_rows), strata))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(n_rows) - starts[strata[order]]
+    return np.sort(order[rank < keep[strata[order]]])
+
+
+def stratified_group_totals(strata, population, groups, n_groups, values=None):
+    # Estimated population totals of `values` (row counts when None) for
+    # every group, and their variances, from a stratified sample. Rows with
+    # a negative group lie outside the domain. Strata that lie wholly in or
+    # out of a group (the cube filters) contribute no variance to its count.
+    n_strata = len(population)
+    sizes = np.bincount(strata, minlength=n_strata).astype(float)[:, None]
+    inside = groups >= 0
+    keys = strata[inside] * n_groups + groups[inside]
+    z = np.ones(len(keys)) if values is None else values[inside]
+    sums = np.bincount(keys, weights=z, minlength=n_strata * n_groups).reshape(n_strata, n_groups)
+    squares = np.bincount(keys, weights=z ** 2, minlength=n_strata * n_groups).reshape(n_strata, n_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(sizes > 0, sums / sizes, 0.0)
+        variances = np.where(sizes > 1, np.maximum(squares - sizes * means ** 2, 0) / (sizes - 1), 0.0)
+        terms = population[:, None] ** 2 * (1 - sizes / population[:, None]) * variances / sizes
+
+    totals = (population[:, None] * means).sum(axis=0)
+    return totals, np.nansum(np.where(sizes > 0, terms, 0), axis=0)
+
+
+def stratified_total(strata, population, values, in_domain):
+    total, variance = stratified_group_totals(strata, population, np.where(in_domain, 0, -1), 1, values)
+    return total[0], variance[0]
+
+
+def estimate_distinct(strata, population, values, in_domain, multiplicity):
+    # Distinct values in the domain, for the full data, and the estimate's
+    # variance. `multiplicity` is how many rows each value has in the full
+    # data. A value seen more than once in the sample counts once. A value
+    # seen once also stands for the values whose rows were all missed:
+    # 1 + (w - 1) / m of them, for a row standing for w rows and a value
+    # with m rows. With unique values this is the Horvitz-Thompson count,
+    # unbiased; it is exact when the sample holds every row.
+    _, inverse, counts = np.unique(values[in_domain], return_inverse=True, return_counts=True)
+    once = np.zeros(len(values))
+    once[in_domain] = counts[inverse] == 1
+    share = once / multiplicity
+    scaled, variance = stratified_total(strata, population, share, in_domain)
+    return int(np.count_nonzero(counts > 1)) + float((once - share).sum() + scaled), variance
+
+
+def estimate_kpis(strata, population, amounts, ratings, customers, multiplicity, in_domain, confidence=0.95):
+    # Same KPIs as Chart.compute_kpis, each with a confidence interval.
+    # Averages are ratio estimators with linearized variances.
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    count, _ = stratified_total(strata, population, np.ones(len(strata)), in_domain)
+    revenue, revenue_var = stratified_total(strata, population, amounts, in_domain)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_order_value = revenue / count
+        _, order_var = stratified_total(strata, population, amounts - average_order_value, in_domain)
+        rating_total, _ = stratified_total(strata, population, ratings, in_domain)
+        average_rating = rating_total / count
+        _, rating_var = stratified_total(strata, population, ratings - average_rating, in_domain)
+        order_margin = z * np.sqrt(order_var) / count
+        rating_margin = z * np.sqrt(rating_var) / count
+
+    revenue_margin = z * np.sqrt(revenue_var)
+    customers, customers_var = estimate_distinct(strata, population, customers, in_domain, multiplicity)
+    customers_margin = z * np.sqrt(customers_var)
+
+    return (
+        (float(revenue), float(average_order_value), round(customers), float(average_rating)),
+        {
+            'total_revenue': (float(revenue - revenue_margin), float(revenue + revenue_margin)),
+            'total_customers': (max(float(customers - customers_margin), 0.0), float(customers + customers_margin)),
+            'average_order_value': (float(average_order_value - order_margin),
+                                    float(average_order_value + order_margin)),
+            'average_rating': (float(average_rating - rating_margin), float(average_rating + rating_margin)),
+        },
+    )
+
+
+class SampleBackend:
+    # The chart backend of a sample: counts and sums are estimated for the
+    # full data, stratum by stratum, and carry the half-widths of their
+    # confidence intervals in attrs['margin']; means are ratio estimates.
+    name = 'sample'
+
+    def __init__(self, df, strata, population, multiplicities, confidence=0.95):
+        self.df = df
+        self.strata = strata
+        self.population = population
+        # Rows per value in the full data, for the columns counted with
+        # nunique.
+        self.multiplicities = multiplicities
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def memory_usage(self):
+        return 0
+
+    def totals(self, rows, keys, column=None):
+        # Estimates for every group of `keys` seen in the selected rows,
+        # in order of first appearance.
+        index = pd.MultiIndex.from_frame(self.df[keys]) if len(keys) > 1 else pd.Index(self.df[keys[0]])
+        codes, labels = index.factorize()
+        groups = np.full(len(self.df), -1, dtype=np.int64)
+        selected = slice(None) if rows is None else rows
+        groups[selected] = codes[selected]
+
+        values = None if column is None else self.df[column].to_numpy(dtype=float)
+        totals, variances = stratified_group_totals(self.strata, self.population, groups, len(labels), values)
+        seen = np.bincount(groups[groups >= 0], minlength=len(labels)) > 0
+        return totals[seen], self.z * np.sqrt(variances[seen]), labels[seen]
+
+    def estimates(self, rows, key, column=None):
+        totals, margins, labels = self.totals(rows, [key], column)
+        if column is None:
+            totals = np.rint(totals).astype(np.int64)
+        index = pd.Index(labels, name=key)
+        estimates = pd.Series(totals, index=index, name='count' if column is None else column)
+        estimates.attrs['margin'] = pd.Series(margins, index=index)
+        return estimates
+
+    def value_counts(self, rows, column):
+        counts = self.estimates(rows, column)
+        return counts.iloc[np.argsort(-counts.to_numpy(), kind='stable')]
+
+    def group_size(self, rows, keys):
+        totals, _, labels = self.totals(rows, keys)
+        labels = labels if len(keys) > 1 else pd.MultiIndex.from_arrays([labels])
+        counts = labels.to_frame(index=False, name=keys)
+        counts['count'] = np.rint(totals).astype(np.int64)
+        return counts.sort_values(keys, ignore_index=True)
+
+    def group_aggregate(self, rows, by, column, how):
+        totals = self.estimates(rows, by, column).sort_index()
+        if how == 'sum':
+            return totals
+        counts = self.estimates(rows, by).sort_index()
+        return pd.Series(totals.to_numpy() / counts.to_numpy(), index=totals.index, name=column)
+
+    def aggregate(self, rows, aggregations):
+        in_domain = np.zeros(len(self.df), dtype=bool)
+        in_domain[slice(None) if rows is None else rows] = True
+        count, _ = stratified_total(self.strata, self.population, np.ones(len(self.df)), in_domain)
+
+        results = {}
+        for name, (column, how) in aggregations.items():
+            values = self.df[column].to_numpy()
+            if how == 'nunique':
+                results[name] = round(estimate_distinct(
+                    self.strata, self.population, values, in_domain, self.multiplicities[column])[0])
+                continue
+            total, _ = stratified_total(self.strata, self.population, values.astype(float), in_domain)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                results[name] = float(total if how == 'sum' else total / count)
+        return results
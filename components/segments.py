@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+SEGMENTS = ['Champions', 'Loyal Customers', 'Promising', "Can't Lose Them",
+            'At Risk', 'Needs Attention', 'Hibernating']
+RFM_COLUMNS = ['customer_id', 'purchase_frequency_days', 'previous_purchases', 'purchase_amount']
+
+
+def quantile_scores(values, bins=5, higher_is_better=True):
+    # Tied values share their average rank, so a column with only a few
+    # distinct values still lands each value in a single score.
+    inverse, uniques = pd.factorize(values, sort=True)
+    counts = np.bincount(inverse, minlength=len(uniques))
+    midranks = np.cumsum(counts) - (counts - 1) / 2
+    scores = np.clip(np.ceil(midranks[inverse] / len(values) * bins), 1, bins).astype(np.int8)
+    return scores if higher_is_better else (bins + 1 - scores).astype(np.int8)
+
+
+def group_reduce(codes, values, n_groups, how):
+    # factorize numbers customers by first appearance, so one row per
+    # customer means the rows are already in group order.
+    if n_groups == len(codes):
+        return values
+    if how == 'sum':
+        return np.bincount(codes, weights=values, minlength=n_groups)
+
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+    reduce = np.minimum if how == 'min' else np.maximum
+    return reduce.reduceat(values[order], starts)
+
+
+def customer_rfm(df, bins=5):
+    codes, customers = pd.factorize(df['customer_id'])
+    n = len(customers)
+    if n == 0:
+        return pd.DataFrame({
+            'customer_id': customers, 'recency_days': [], 'frequency': [], 'monetary': [],
+            'r_score': [], 'f_score': [], 'm_score': [],
+            'segment': pd.Categorical([], SEGMENTS),
+        }), codes
+
+    recency = group_reduce(
+        codes, df['purchase_frequency_days'].to_numpy(dtype=float), n, 'min')
+    frequency = group_reduce(
+        codes, df['previous_purchases'].to_numpy(dtype=float), n, 'max') + np.bincount(codes, minlength=n)
+    monetary = group_reduce(
+        codes, df['purchase_amount'].to_numpy(dtype=float), n, 'sum')
+
+    r = quantile_scores(recency, bins, higher_is_better=False)
+    f = quantile_scores(frequency, bins)
+    m = quantile_scores(monetary, bins)
+
+    fm = (f + m) / 2
+    segment = np.select(
+        [(r >= 4) & (fm >= 4), (r >= 3) & (fm >= 3), r >= 4,
+         (r <= 2) & (fm >= 4), (r <= 2) & (fm >= 3), r == 3],
+        list(range(6)), default=6)
+
+    return pd.DataFrame({
+        'customer_id': customers,
+        'recency_days': recency,
+        'frequency': frequency,
+        'monetary': monetary,
+        'r_score': r,
+        'f_score': f,
+        'm_score': m,
+        'segment': pd.Categorical.from_codes(segment, SEGMENTS),
+    }), codes
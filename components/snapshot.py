@@ -0,0 +1,95 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+
+from .dataset import PartitionedDataset
+
+ALIGNMENT = 64
+
+
+def source_hash(csv_file, partitions=None):
+    digest = hashlib.sha256()
+    if isinstance(csv_file, (str, os.PathLike)) and os.path.isdir(csv_file):
+        csv_file = PartitionedDataset(csv_file)
+
+    if isinstance(csv_file, PartitionedDataset):
+        # Partitions are fingerprinted by stat so that adding a file does
+        # not mean re-reading every other file.
+        for path, _ in csv_file.prune(partitions):
+            stat = os.stat(path)
+            digest.update(
+                f'{os.path.relpath(path, csv_file.path)}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    else:
+        with open(csv_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+    digest.update(repr(sorted((key, tuple(values))
+                  for key, values in (partitions or {}).items())).encode())
+    return digest.hexdigest()
+
+
+def snapshot_path(snapshot_dir, version):
+    return os.path.join(snapshot_dir, version)
+
+
+def save_snapshot(chart, snapshot_dir):
+    # Array buffers are written out-of-band into one aligned file, so a
+    # load maps them instead of unpickling their bytes.
+    buffers = []
+    payload = pickle.dumps(chart, protocol=5, buffer_callback=buffers.append)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=snapshot_dir, prefix='.tmp-')
+    try:
+        offsets = []
+        with open(os.path.join(staging, 'buffers.bin'), 'wb') as f:
+            for buffer in buffers:
+                raw = buffer.raw()
+                f.write(b'\0' * (-f.tell() % ALIGNMENT))
+                offsets.append((f.tell(), raw.nbytes))
+                f.write(raw)
+
+        with open(os.path.join(staging, 'state.pkl'), 'wb') as f:
+            f.write(payload)
+
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump({'version': chart.version, 'buffers': offsets}, f)
+
+        target = snapshot_path(snapshot_dir, chart.version)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def remove_snapshot(snapshot_dir, version):
+    shutil.rmtree(snapshot_path(snapshot_dir, version), ignore_errors=True)
+
+
+def load_snapshot(snapshot_dir, version):
+    path = snapshot_path(snapshot_dir, version)
+    try:
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        with open(os.path.join(path, 'state.pkl'), 'rb') as f:
+            payload = f.read()
+    except FileNotFoundError:
+        return None
+    if manifest['version'] != version:
+        return None
+
+    mapped = memoryview(b'')
+    with open(os.path.join(path, 'buffers.bin'), 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            mapped = memoryview(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    views = [mapped[offset:offset + size]
+             for offset, size in manifest['buffers']]
+    return pickle.loads(payload, buffers=views)
@@ -0,0 +1,66 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+BOOTSTRAP_SAMPLES = 1000
+# Groups at least this large use the normal approximation instead.
+ANALYTIC_MIN_SIZE = 500
+# Upper bound on resampled values held in memory per batch.
+MAX_BATCH_CELLS = 4_000_000
+
+
+def mean_intervals(values, codes=None, n_groups=None, confidence=0.95,
+                   n_boot=BOOTSTRAP_SAMPLES, seed=0):
+    values = np.asarray(values, dtype=float)
+    codes = np.zeros(len(values), dtype=np.intp) if codes is None else np.asarray(codes)
+    n_groups = (int(codes.max()) + 1 if len(codes) else 0) if n_groups is None else n_groups
+
+    sizes = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+    squares = np.bincount(codes, weights=values ** 2, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / sizes
+        variances = np.maximum(squares / sizes - means ** 2, 0) * sizes / (sizes - 1)
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin = z * np.sqrt(variances / sizes)
+    lower = means - margin
+    upper = means + margin
+    method = np.where(sizes >= ANALYTIC_MIN_SIZE, 'analytic', 'bootstrap')
+
+    boot = np.flatnonzero((sizes > 0) & (sizes < ANALYTIC_MIN_SIZE))
+    if len(boot):
+        lower[boot], upper[boot] = bootstrap_means(
+            values, codes, boot, sizes, confidence, n_boot, seed)
+
+    return pd.DataFrame({'mean': means, 'lower': lower, 'upper': upper,
+                         'n': sizes, 'method': method})
+
+
+def bootstrap_means(values, codes, groups, sizes, confidence, n_boot, seed):
+    # Rows of the bootstrapped groups are laid out contiguously, so one
+    # matrix of uniform draws resamples every group at once and
+    # np.add.reduceat turns each replicate row into per-group sums.
+    keep = np.isin(codes, groups)
+    order = np.argsort(codes[keep], kind='stable')
+    ordered = values[keep][order]
+    group_sizes = sizes[groups]
+    starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+    row_starts = np.repeat(starts, group_sizes)
+    row_sizes = np.repeat(group_sizes, group_sizes)
+
+    rng = np.random.default_rng(seed)
+    batch = max(1, MAX_BATCH_CELLS // len(ordered))
+    means = np.empty((n_boot, len(groups)))
+    for first in range(0, n_boot, batch):
+        count = min(batch, n_boot - first)
+        draws = rng.random((count, len(ordered)))
+        index = row_starts + (draws * row_sizes).astype(np.intp)
+        means[first:first + count] = np.add.reduceat(
+            ordered[index], starts, axis=1) / group_sizes
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(means, [alpha, 1 - alpha], axis=0)
+    return lower, upper
@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def top_k(values, k, valid=None):
+    values = np.asarray(values, dtype=float)
+    candidates = np.arange(len(values)) if valid is None else np.flatnonzero(valid)
+    if k <= 0 or len(candidates) == 0:
+        return candidates[:0]
+
+    # argpartition finds the k-th largest value in linear time; every key
+    # tied with it is kept so ties resolve by first appearance below.
+    if k < len(candidates):
+        part = np.argpartition(-values[candidates], k - 1)[:k]
+        threshold = values[candidates[part]].min()
+        candidates = candidates[values[candidates] >= threshold]
+
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order][:k]
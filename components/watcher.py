@@ -0,0 +1,54 @@
+import threading
+import time
+
+from .dataset import source_signature
+
+
+class DatasetWatcher(threading.Thread):
+    def __init__(self, registry, interval=5.0):
+        super().__init__(name='dataset-watcher', daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.pending = {}
+
+        self.polls = 0
+        self.swaps = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_swap = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        self.stopped.set()
+
+    def poll(self):
+        self.polls += 1
+        for tenant, csv_file, partitions, signature in self.registry.watched():
+            try:
+                current = source_signature(csv_file, partitions)
+            except OSError:
+                # The file is being replaced; look again on the next poll.
+                continue
+
+            if current == signature:
+                self.pending.pop(tenant, None)
+                continue
+
+            # Only rebuild once the file has stopped changing between two
+            # polls, so a half-written export is never swapped in.
+            if self.pending.get(tenant) != current:
+                self.pending[tenant] = current
+                continue
+
+            try:
+                if self.registry.refresh(tenant):
+                    self.swaps += 1
+                    self.last_swap = time.time()
+                self.pending.pop(tenant, None)
+            except Exception as error:
+                self.errors += 1
+                self.last_error = repr(error)
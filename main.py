@@ -1,6 +1,19 @@
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import plotly.graph_objects as go
 import streamlit as st
 
-from components import Chart
+from components import DatasetRegistry, FilterState, PartitionedDataset
+from components.clustering import CLUSTERS
+from components.compare import COMPARE_DIMENSIONS, merge_selections
+from components.export import FORMATS, export_file
+from components.ranges import RANGE_COLUMNS
+from components.segments import SEGMENTS
 
 st.set_page_config(
     page_title="Customer Behavior Analytics Dashboard",
@@ -27,204 +40,516 @@ st.markdown(
 st.title("Customer Analytics")
 st.caption("Data-driven insights for smarter decisions")
 
-c = Chart('data/customer_behavior.csv')
+DATA_PATH = os.environ.get('CUSTOMER_DATA_PATH', 'data/customer_behavior.csv')
+TENANTS = {'default': DATA_PATH, **
+           json.loads(os.environ.get('CUSTOMER_DATA_TENANTS', '{}'))}
+# Datasets larger than this start in approximate-first mode.
+PROGRESSIVE_MIN_ROWS = int(os.environ.get('CUSTOMER_DATA_PROGRESSIVE_ROWS', '1000000'))
+# The cache debug panel is shown when this is set or with ?debug in the
+# URL, but only this setting lets it change the cache budgets, which are
+# shared by every session and tenant.
+DEBUG = os.environ.get('CUSTOMER_DATA_DEBUG', '') not in ('', '0')
+# Cache metrics are logged as one JSON line per rerun to this file, or to
+# stderr when it is '-'.
+METRICS_LOG = os.environ.get('CUSTOMER_DATA_METRICS_LOG', '')
+
+
+@st.cache_resource
+def load_dataset(path):
+    return PartitionedDataset(path)
+
+
+@st.cache_resource
+def chart_pool():
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+
+@st.cache_resource
+def metrics_logger():
+    logger = logging.getLogger('customer_analytics.cache')
+    if METRICS_LOG:
+        handler = logging.StreamHandler() if METRICS_LOG == '-' else logging.FileHandler(METRICS_LOG)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+@st.cache_resource
+def load_registry():
+    registry = DatasetRegistry(
+        memory_budget=int(os.environ.get(
+            'CUSTOMER_DATA_MEMORY_MB', '1024')) * 2**20,
+        snapshot_dir=os.environ.get('CUSTOMER_DATA_SNAPSHOT_DIR', '.snapshots') or None,
+        backend=os.environ.get('CUSTOMER_DATA_BACKEND', 'pandas'))
+
+    watch_seconds = float(os.environ.get('CUSTOMER_DATA_WATCH_SECONDS', '5'))
+    if watch_seconds > 0:
+        registry.watch(watch_seconds)
+    return registry
+
+
+FILTER_LABELS = {
+    'subscription_status': 'Subscription Status:',
+    'gender': 'Gender:',
+    'category': 'Category: ',
+    'shipping_type': 'Shipping Type: ',
+    'age_group': 'Age Group: ',
+}
+RANGE_LABELS = {
+    'age': 'Age:',
+    'purchase_amount': 'Purchase Amount ($):',
+    'review_rating': 'Review Rating:',
+    'previous_purchases': 'Previous Purchases:',
+}
+COMPARE_KPIS = [
+    ('total_revenue', '💰 Total Revenue', '${:,.0f}'),
+    ('average_order_value', '📈 Average Order Value', '${:,.2f}'),
+    ('total_customers', '👥 Total Customers', '{:,.0f}'),
+    ('average_rating', '⭐ Average Rating', '{:,.2f}'),
+]
+
+tenant = st.query_params.get('tenant', 'default')
+if tenant not in TENANTS:
+    st.error(f"Unknown tenant: {tenant}")
+    st.stop()
+data_path = TENANTS[tenant]
+
+partitions = None
+if os.path.isdir(data_path):
+    with st.sidebar:
+        st.header("🗂️ Partitions")
+        partitions = []
+        for key, values in load_dataset(data_path).partition_values().items():
+            selected = st.multiselect(
+                f'{key}:', options=values, key=f'partition_{key}', placeholder='All')
+            if selected:
+                partitions.append((key, tuple(selected)))
+        partitions = tuple(partitions)
+
+if partitions is None:
+    c = load_registry().get((tenant, None), data_path)
+else:
+    c = load_registry().get((tenant, partitions),
+                            load_dataset(data_path), dict(partitions))
+filter_state = st.session_state.setdefault('filter_state', FilterState())
+c = c.for_session(filter_state)
+
+# Ranges belong to the data they were picked on: they are dropped when the
+# tenant or partitions change, or when the data reloads and a range no
+# longer lies within its column's bounds.
+moved = st.session_state.get('range_source') != (tenant, partitions)
+st.session_state['range_source'] = (tenant, partitions)
+for column in RANGE_COLUMNS:
+    stored = st.session_state.get(f'range_{column}')
+    if stored is not None:
+        lowest, highest = c.range_bounds(column)
+        if moved or stored[0] < lowest or stored[1] > highest:
+            del st.session_state[f'range_{column}']
+
 with st.sidebar:
     st.header("🔍 Filters")
-    subscription_status = st.selectbox(
-        'Subscription Status:', options=c.subscription_status())
-    gender = st.selectbox('Gender:', options=c.gender())
-    category = st.selectbox('Category: ', options=c.category())
-    shipping_type = st.selectbox('Shipping Type: ', options=c.shipping_type())
-    age_group = st.selectbox('Age Group: ', options=c.age_group())
-
-    subscription_status = None if subscription_status == "All" else subscription_status
-    gender = None if gender == "All" else gender
-    category = None if category == "All" else category
-    shipping_type = None if shipping_type == "All" else shipping_type
-    age_group = None if age_group == "All" else age_group
-
-total_revenue, average_order_value, total_customers, average_rating = c.compute_kpis(
-    subscription_status, gender, category, shipping_type, age_group)
-
-cols = st.columns(4, gap="small")
-
-with cols[0]:
-    st.metric(
-        "💰 Total Revenue",
-        f"${total_revenue:,.0f}",
-        border=True
-    )
-
-with cols[1]:
-    st.metric(
-        "📈 Average Order Value",
-        f"${average_order_value:,.0f}",
-        border=True
-    )
-
-with cols[2]:
-    st.metric(
-        "👥 Total Customers",
-        f"{total_customers:,.0f}",
-        border=True
-    )
-
-with cols[3]:
-    st.metric(
-        "⭐ Average Rating",
-        f"{average_rating:,.1f}",
-        border=True
-    )
-
-
-tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    facet_measure = st.radio(
+        'Option counts:', options=['Rows', 'Revenue'], horizontal=True)
+    prefix = '$' if facet_measure == 'Revenue' else ''
+
+    c = c.with_filters(segment=st.session_state.get('filter_segment'),
+                       cluster=st.session_state.get('filter_cluster'),
+                       ranges={column: st.session_state[f'range_{column}'] for column in RANGE_COLUMNS
+                               if st.session_state.get(f'range_{column}') is not None})
+    current = {dimension: st.session_state.get(f'filter_{dimension}') or None
+               for dimension in FILTER_LABELS}
+    filters = {}
+    for dimension, label in FILTER_LABELS.items():
+        counts = c.facets(dimension, current,
+                          'purchase_amount' if facet_measure == 'Revenue' else None)
+        hidden = [value for value in current[dimension] or []
+                  if value not in counts]
+        filters[dimension] = st.multiselect(
+            label,
+            options=list(counts) + hidden,
+            key=f'filter_{dimension}',
+            placeholder='All',
+            format_func=lambda value, counts=counts: f"{value} ({prefix}{counts.get(value, 0):,.0f})"
+        ) or None
+
+    st.multiselect('RFM Segment:', options=SEGMENTS,
+                   key='filter_segment', placeholder='All')
+    st.multiselect('Cluster:', options=CLUSTERS,
+                   key='filter_cluster', placeholder='All')
+
+    for column in RANGE_COLUMNS:
+        lowest, highest = c.range_bounds(column)
+        if lowest < highest:
+            st.slider(RANGE_LABELS[column], min_value=lowest, max_value=highest, value=(lowest, highest),
+                      step=0.1 if isinstance(lowest, float) else 1, key=f'range_{column}')
+
+    subscription_status, gender, category, shipping_type, age_group = filters.values()
+
+    st.header("⚖️ Compare")
+    compare_mode = st.toggle('Compare two segments', key='compare_mode')
+    segment_filters = {}
+    if compare_mode:
+        for segment in ('A', 'B'):
+            with st.expander(f'Segment {segment}', expanded=True):
+                segment_filters[segment] = {
+                    dimension: st.multiselect(label, options=c.options(dimension),
+                                              key=f'compare_{segment}_{dimension}', placeholder='All')
+                    for dimension, label in FILTER_LABELS.items()}
+
+    st.header("⚡ Performance")
+    progressive = st.toggle(
+        'Approximate first', value=len(c.df) > PROGRESSIVE_MIN_ROWS, key='progressive_mode',
+        help='Show results from a stratified sample right away and replace them with exact ones when ready.')
+
+
+# Chart-local controls live in fragments, so changing one reruns only its
+# chart against the session's cached filter rows.
+@st.fragment
+def top_n_chart(name, key, default):
+    top_n = st.slider('Show top', min_value=5, max_value=25, value=default, key=key)
+    show(name, top_n=top_n)
+
+
+@st.fragment
+def histogram_chart(name, key, default):
+    bins = st.slider('Bins', min_value=5, max_value=50, value=default, key=key)
+    show(name, bins=bins)
+
+
+@st.fragment
+def scatter_chart(name, key):
+    trendline = st.toggle('Trendline', value=True, key=key)
+    show(name, trendline=trendline)
+
+
+def configure_caches():
+    if not DEBUG:
+        return
+    registry = load_registry()
+    registry.configure_caches(
+        memory_budget=st.session_state['budget_dataset_mb'] * 2**20,
+        aggregate_entries=st.session_state['budget_aggregate_entries'],
+        figure_entries=st.session_state['budget_figure_entries'],
+        figure_bytes=st.session_state['budget_figure_mb'] * 2**20)
+    filter_state.resize(st.session_state['budget_filter_entries'])
+
+
+def report_cache_metrics():
+    # Runs last, so the numbers include this run's lookups.
+    if not (METRICS_LOG or debug):
+        return
+    registry = load_registry()
+    metrics = registry.cache_metrics(filter_state)
+    if METRICS_LOG:
+        metrics_logger().info(json.dumps({'event': 'cache_metrics', 'time': time.time(), 'tenant': tenant,
+                                          'caches': metrics}, default=str))
+    if debug:
+        cache_debug_panel(registry, metrics)
+
+
+def cache_debug_panel(registry, metrics):
+    # Budgets are applied in the widgets' callbacks, before the rerun they
+    # trigger.
+    chart_caches = c.cache_stats()
+    with st.sidebar:
+        st.header("🧰 Cache Debug")
+        table = [{**row, 'tenant': str(row['tenant'] or ''),
+                  'hit_rate': row['hits'] / (row['hits'] + row['misses']) if row['hits'] + row['misses'] else None}
+                 for row in metrics]
+        st.dataframe(table, hide_index=True)
+        with st.expander('Raw metrics'):
+            st.json(metrics)
+
+        if not DEBUG:
+            st.caption('Set CUSTOMER_DATA_DEBUG to change the cache budgets.')
+            return
+        st.number_input('Dataset memory (MB)', min_value=1, step=64, key='budget_dataset_mb',
+                        value=registry.memory_budget // 2**20, on_change=configure_caches)
+        st.number_input('Filter entries', min_value=1, key='budget_filter_entries',
+                        value=filter_state.capacity, on_change=configure_caches)
+        st.number_input('Aggregate entries', min_value=1, key='budget_aggregate_entries',
+                        value=chart_caches['aggregate']['capacity'], on_change=configure_caches)
+        st.number_input('Figure entries', min_value=1, key='budget_figure_entries',
+                        value=chart_caches['figure']['capacity'], on_change=configure_caches)
+        st.number_input('Figure memory (MB)', min_value=1, key='budget_figure_mb',
+                        value=(chart_caches['figure']['max_bytes'] or 2**20) // 2**20, on_change=configure_caches)
+
+
+def metric_text(fmt, value, prefix=''):
+    # Averages over no purchases, and their intervals, are NaN.
+    return '–' if math.isnan(value) else prefix + fmt.format(value)
+
+
+def interval_caption(fmt, interval, source=''):
+    low, high = (metric_text(fmt, bound) for bound in interval)
+    return f"95% CI: {'–' if '–' in (low, high) else f'{low} – {high}'}{source}"
+
+
+@st.fragment
+def export_controls(chart, selections):
+    fmt = st.radio('Format:', options=list(FORMATS), horizontal=True, key='export_format')
+    # The file is only built when the button is clicked, in chunks.
+    st.download_button('Download filtered rows', data=lambda: export_file(chart, selections, fmt),
+                       file_name=f'customer_behavior.{fmt}', mime=FORMATS[fmt], on_click='ignore')
+
+
+filter_values = (subscription_status, gender, category, shipping_type, age_group)
+debug = DEBUG or 'debug' in st.query_params
+
+with st.sidebar:
+    st.header("📥 Export")
+    export_controls(c, c.selections(*filter_values))
+
+if compare_mode:
+    # Both segments narrow the sidebar filters and are computed together.
+    selections_a = merge_selections(c.selections(*filter_values), segment_filters['A'])
+    selections_b = merge_selections(c.selections(*filter_values), segment_filters['B'])
+    comparison = c.compare(selections_a, selections_b)
+    kpis = comparison['kpis']
+
+    st.subheader("⚖️ Segment A vs Segment B")
+    st.caption("Segment A: {:,} purchases · Segment B: {:,} purchases".format(*comparison['counts']))
+    cols = st.columns(4, gap="small")
+    for col, (key, label, fmt) in zip(cols, COMPARE_KPIS):
+        a, b = kpis.at[key, 'A'], kpis.at[key, 'B']
+        # Averages over a segment with no purchases are undefined.
+        delta = None
+        if not (math.isnan(a) or math.isnan(b)):
+            delta = ('-' if b < a else '+') + fmt.format(abs(b - a))
+        with col:
+            st.metric(f"{label} (A)", metric_text(fmt, a), border=True)
+            st.metric(f"{label} (B)", metric_text(fmt, b), delta=delta, border=True)
+
+    st.plotly_chart(c.create_measure_comparison(
+        selections_a, selections_b), width='stretch')
+    for index in range(0, len(COMPARE_DIMENSIONS), 2):
+        for col, dimension in zip(st.columns(2), COMPARE_DIMENSIONS[index:index + 2]):
+            with col:
+                st.plotly_chart(c.create_breakdown_comparison(
+                    selections_a, selections_b, dimension), width='stretch')
+    report_cache_metrics()
+    st.stop()
+
+
+def render_kpis(slots, kpis, kpi_intervals, approximate=False):
+    total_revenue, average_order_value, total_customers, average_rating = kpis
+    prefix = '≈ ' if approximate else ''
+    source = ' (sample)' if approximate else ''
+
+    with slots[0].container():
+        st.metric(
+            "💰 Total Revenue",
+            metric_text("${:,.0f}", total_revenue, prefix),
+            border=True
+        )
+        st.caption(interval_caption("${:,.0f}", kpi_intervals['total_revenue'], source))
+
+    with slots[1].container():
+        st.metric(
+            "📈 Average Order Value",
+            metric_text("${:,.0f}", average_order_value, prefix),
+            border=True
+        )
+        st.caption(interval_caption("${:,.2f}", kpi_intervals['average_order_value'], source))
+
+    with slots[2].container():
+        st.metric(
+            "👥 Total Customers",
+            metric_text("{:,.0f}", total_customers, prefix),
+            border=True
+        )
+        # Exact counts have no interval.
+        if 'total_customers' in kpi_intervals:
+            st.caption(interval_caption("{:,.0f}", kpi_intervals['total_customers'], source))
+
+    with slots[3].container():
+        st.metric(
+            "⭐ Average Rating",
+            metric_text("{:,.1f}", average_rating, prefix),
+            border=True
+        )
+        st.caption(interval_caption("{:,.2f}", kpi_intervals['average_rating'], source))
+
+
+# KPIs are drawn first. Every chart, the fragment charts included, then
+# gets a placeholder right away and is computed on the thread pool;
+# placeholders are filled in the order the figures finish. In
+# approximate-first mode the placeholders hold the estimates from the
+# stratified sample until the exact results arrive.
+pending = {}
+streaming = True
+sample = c.sample() if progressive else None
+kpi_slots = [col.empty() for col in st.columns(4, gap="small")]
+if progressive:
+    render_kpis(kpi_slots, *sample.estimate_kpis(*filter_values), approximate=True)
+    pending[chart_pool().submit(
+        lambda: (c.compute_kpis(*filter_values), c.compute_kpi_intervals(*filter_values)))] = \
+        lambda kpis: render_kpis(kpi_slots, *kpis)
+else:
+    render_kpis(kpi_slots, c.compute_kpis(*filter_values), c.compute_kpi_intervals(*filter_values))
+
+
+def show(name, **options):
+    slot = st.empty()
+    if not streaming:
+        # A fragment rerun after the page is drawn redraws only its own
+        # chart, so there is nothing to wait alongside.
+        slot.plotly_chart(getattr(c, name)(*filter_values, **options), width='stretch')
+        return
+
+    if progressive:
+        # A copy, so the title change stays out of the sample's figure cache.
+        approximate = go.Figure(getattr(sample, name)(*filter_values, **options), _validate=False)
+        approximate.update_layout(title_text=f'{approximate.layout.title.text} (approximate)')
+        slot.plotly_chart(approximate, width='stretch')
+    else:
+        slot.caption('⏳ Loading chart…')
+    pending[chart_pool().submit(getattr(c, name), *filter_values, **options)] = \
+        lambda figure: slot.plotly_chart(figure, width='stretch')
+
+
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
     "📊 Overview",
     "👥 Customer Insights",
     "🛍️ Product Performance",
     "💳 Purchase Behavior",
     "🚚 Shipping & Delivery",
     "🗺️ Geographic Analysis",
-    "🔍 Advanced Analytics"
+    "🔍 Advanced Analytics",
+    "🎯 Segments"
 ])
 
 with tab1:
     colA1, colA2 = st.columns(2)
     with colA1:
-        st.plotly_chart(c.create_revenue_by_category(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_revenue_by_category')
 
     with colA2:
-        st.plotly_chart(c.create_revenue_by_season(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_revenue_by_season')
 
     colB1, colB2 = st.columns(2)
 
     with colB1:
-        st.plotly_chart(c.create_purchase_amount_distribution(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        histogram_chart('create_purchase_amount_distribution', 'bins_purchase_amount', 20)
 
     with colB2:
-        st.plotly_chart(c.create_customer_by_age_group(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_customer_by_age_group')
 
 with tab2:
     colA1, colA2 = st.columns(2)
     with colA1:
-        st.plotly_chart(c.create_gender_distribution(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_gender_distribution')
 
     with colA2:
-        st.plotly_chart(c.create_customer_count_age_group(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_customer_count_age_group')
 
     colB1, colB2 = st.columns(2)
 
     with colB1:
-        st.plotly_chart(c.create_purchase_by_age_boxplot(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_purchase_by_age_boxplot')
 
     with colB2:
-        st.plotly_chart(c.create_previous_purchases_distribution(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        histogram_chart('create_previous_purchases_distribution', 'bins_previous_purchases', 15)
 
-    st.plotly_chart(c.create_review_rating_distribution(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+    show('create_review_rating_distribution')
 
 with tab3:
     colA1, colA2 = st.columns(2)
     with colA1:
-        st.plotly_chart(c.create_top_10_items(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        top_n_chart('create_top_10_items', 'top_items', 10)
 
     with colA2:
-        st.plotly_chart(c.create_top_colors(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_top_colors')
     colB1, colB2 = st.columns(2)
     with colB1:
-        st.plotly_chart(c.create_category_treemap(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_category_treemap')
 
     with colB2:
-        st.plotly_chart(c.create_avg_rating_by_category(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_avg_rating_by_category')
 
     colC1, colC2 = st.columns(2)
 
     with colC1:
-        st.plotly_chart(c.create_category_by_season(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_category_by_season')
 
     with colC2:
-        st.plotly_chart(c.create_size_distribution(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_size_distribution')
 
 
 with tab4:
     colA1, colA2 = st.columns(2)
     with colA1:
-        st.plotly_chart(c.create_purchase_frequency(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_purchase_frequency')
 
     with colA2:
-        st.plotly_chart(c.create_payment_methods(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_payment_methods')
     colB1, colB2 = st.columns(2)
     with colB1:
-        st.plotly_chart(c.create_subscription_comparison(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_subscription_comparison')
 
     with colB2:
-        st.plotly_chart(c.create_discount_impact(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_discount_impact')
 
-    st.plotly_chart(c.create_purchase_frequency_days(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+    show('create_purchase_frequency_days')
 
 with tab5:
     colA1, colA2 = st.columns(2)
     with colA1:
-        st.plotly_chart(c.create_shipping_distribution(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_shipping_distribution')
 
     with colA2:
-        st.plotly_chart(c.create_avg_purchase_by_shipping(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_avg_purchase_by_shipping')
     colB1, colB2 = st.columns(2)
     with colB1:
-        st.plotly_chart(c.create_shipping_by_category(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_shipping_by_category')
 
     with colB2:
-        st.plotly_chart(c.create_subscription_shipping(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        show('create_subscription_shipping')
 
 with tab6:
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        st.plotly_chart(c.create_top_states_revenue(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        top_n_chart('create_top_states_revenue', 'top_states_revenue', 15)
 
     with col2:
-        st.plotly_chart(c.create_top_states_customers(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        top_n_chart('create_top_states_customers', 'top_states_customers', 15)
 
     with col3:
-        st.plotly_chart(c.create_avg_purchase_by_state(
-            subscription_status, gender, category, shipping_type, age_group), width='stretch')
+        top_n_chart('create_avg_purchase_by_state', 'top_states_average', 15)
 
 with tab7:
-    st.plotly_chart(c.create_correlation_heatmap(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+    show('create_correlation_heatmap')
+
+    scatter_chart('create_age_vs_purchase', 'trendline_age')
+
+    scatter_chart('create_previous_vs_current', 'trendline_previous')
+
+    show('create_rating_vs_purchase')
+
+    show('create_age_group_metrics')
+
+with tab8:
+    colA1, colA2 = st.columns(2)
+    with colA1:
+        show('create_segment_distribution')
+
+    with colA2:
+        show('create_segment_revenue')
 
-    st.plotly_chart(c.create_age_vs_purchase(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+    show('create_rfm_heatmap')
 
-    st.plotly_chart(c.create_previous_vs_current(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+    colB1, colB2 = st.columns(2)
+    with colB1:
+        show('create_cluster_sizes')
+
+    with colB2:
+        show('create_cluster_profiles')
 
-    st.plotly_chart(c.create_rating_vs_purchase(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+for future in as_completed(pending):
+    pending[future](future.result())
+streaming = False
 
-    st.plotly_chart(c.create_age_group_metrics(
-        subscription_status, gender, category, shipping_type, age_group), width='stretch')
+report_cache_metrics()